@@ -17,13 +17,36 @@ class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
     
     # Database settings
+    database_backend: str = Field(default="mongo", description="Database backend: mongo, or memory for an in-process stand-in used by tests and benchmarks")
     mongodb_url: str = Field(..., description="MongoDB connection URL")
     database_name: str = Field(..., description="Database name")
+    mongo_max_pool_size: int = Field(default=50, description="Maximum MongoDB connections per server")
+    mongo_min_pool_size: int = Field(default=10, description="Minimum idle MongoDB connections kept open")
+    mongo_wait_queue_timeout_ms: Optional[int] = Field(default=5000, description="Maximum wait for a pooled connection; unset waits indefinitely")
+    mongo_server_selection_timeout_ms: int = Field(default=5000, description="Maximum wait to find a suitable MongoDB server")
+    analytics_read_preference: str = Field(default="secondaryPreferred", description="Read preference for stats endpoints: primary, primaryPreferred, secondary, secondaryPreferred or nearest")
+    analytics_max_staleness_seconds: Optional[int] = Field(default=120, description="Maximum replication lag of secondaries serving stats reads (at least 90); unset means no bound")
+    readiness_max_pool_saturation: float = Field(default=0.9, description="Checked-out share of the pool above which /api/ready reports not ready")
+    readiness_ping_timeout_seconds: float = Field(default=2.0, description="Timeout for the readiness ping")
+    db_command_monitoring_enabled: bool = Field(default=True, description="Attribute MongoDB command time to requests and emit Server-Timing headers")
+    slow_query_threshold_ms: Optional[float] = Field(default=100.0, description="Record find/aggregate commands slower than this; unset disables the slow query log")
+    slow_query_log_size_bytes: int = Field(default=16777216, description="Size of the capped slow_queries collection")
+    slow_query_explain: bool = Field(default=True, description="Capture executionStats explain output for slow queries")
+    slow_query_explain_interval_seconds: float = Field(default=300.0, description="Explain each slow query shape at most once per interval; other hits are only counted")
+    change_streams_enabled: bool = Field(default=True, description="Invalidate in-process caches from a change stream so writes by other workers are seen (needs a replica set)")
+    change_stream_name: str = Field(default="cache-invalidation", description="Prefix of the key under which each worker stores its change stream resume token")
+    change_stream_worker_id: Optional[str] = Field(default=None, description="Stable id of this worker so a restart resumes its own change stream position; defaults to host:pid")
+    change_stream_collections: List[str] = Field(default=["users", "tickets", "api_keys"], description="Collections whose changes are published to local caches")
+    change_stream_max_await_ms: int = Field(default=1000, description="Maximum wait for new changes per change stream getMore")
+    change_stream_token_save_interval_seconds: float = Field(default=5.0, description="Minimum interval between resume token writes")
+    change_stream_retry_seconds: float = Field(default=5.0, description="Delay before reopening a failed change stream")
     
     # JWT settings
     secret_key: str = Field(..., description="JWT secret key")
     algorithm: str = Field(default="HS256", description="JWT algorithm")
     access_token_expire_minutes: int = Field(default=30, description="Token expiration time")
+    stateless_auth_enabled: bool = Field(default=False, description="Embed role/status claims in tokens and authorize read-only endpoints without a user lookup")
+    api_key_reload_seconds: float = Field(default=30.0, description="Interval between API key index reloads, bounding how long a key revoked on another worker stays usable")
     
     # Redis settings (for real-time features)
     redis_url: str = Field(default="redis://localhost:6379", description="Redis connection URL")
@@ -63,6 +86,34 @@ class Settings(BaseSettings):
     password_min_length: int = Field(default=8, description="Minimum password length")
     max_login_attempts: int = Field(default=5, description="Maximum login attempts")
     lockout_duration_minutes: int = Field(default=30, description="Lockout duration in minutes")
+    max_login_attempts_per_ip: int = Field(default=20, description="Maximum failed login attempts per client IP")
+    login_throttle_backend: str = Field(default="memory", description="Login attempt store: memory or mongo")
+    bcrypt_rounds: Optional[int] = Field(default=None, description="Fixed bcrypt cost shared by every node; weaker hashes are upgraded on login. Calibrated or library default when unset")
+    bcrypt_min_rounds: int = Field(default=10, description="Lowest bcrypt cost calibration may choose; weaker hashes are upgraded on login")
+    bcrypt_target_ms: float = Field(default=250.0, gt=0, description="Target bcrypt verify time used by calibration")
+    bcrypt_calibrate_on_startup: bool = Field(default=False, description="Benchmark bcrypt at startup when bcrypt_rounds is unset")
+    password_hash_workers: int = Field(default=4, description="Worker threads for password hashing")
+    password_hash_queue_size: int = Field(default=64, description="Maximum password hashing requests waiting for a worker")
+    password_hash_queue_timeout_seconds: float = Field(default=5.0, description="Maximum wait for a password hashing worker")
+    
+    # Caching settings
+    user_cache_max_size: int = Field(default=10000, description="Maximum cached authenticated users")
+    user_cache_ttl_seconds: int = Field(default=60, description="Authenticated user cache TTL in seconds")
+    token_cache_max_size: int = Field(default=10000, description="Maximum cached verified JWT claim sets")
+    token_cache_ttl_seconds: int = Field(default=300, description="Upper bound on verified JWT claim cache TTL in seconds")
+    ticket_cache_max_size: int = Field(default=5000, description="Maximum cached ticket documents")
+    ticket_cache_ttl_seconds: int = Field(default=30, description="Ticket document cache TTL in seconds")
+    
+    # Activity tracking settings
+    last_login_flush_interval_seconds: float = Field(default=10.0, description="Interval between last_login bulk writes")
+    last_login_granularity_seconds: float = Field(default=60.0, description="Minimum last_login change worth writing")
+    counter_flush_interval_seconds: float = Field(default=1.0, description="Interval between buffered counter bulk writes")
+    counter_flush_max_pending: int = Field(default=500, description="Buffered documents that trigger an early counter flush")
+    insert_batch_window_ms: float = Field(default=2.0, description="How long inserts wait to be grouped into one insert_many")
+    insert_batch_max_size: int = Field(default=100, description="Queued inserts that trigger an immediate insert_many")
+    lease_default_ttl_seconds: float = Field(default=30.0, description="Lease lifetime without renewal for singleton background jobs")
+    migration_batch_size: int = Field(default=500, description="Documents read per migration batch")
+    migration_target_ops_per_second: Optional[float] = Field(default=1000.0, description="Migration write rate ceiling; unset runs unthrottled")
     
     class Config:
         env_file = ".env"
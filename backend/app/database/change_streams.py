@@ -0,0 +1,267 @@
+"""
+Change-stream driven cache invalidation
+One database-level change stream per process publishes writes made by any worker to the
+in-process caches that registered for them; each worker stores its own resume token so a
+restart picks up where that worker's stream left off
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorChangeStream, AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+RESUME_TOKENS_COLLECTION = "change_stream_tokens"
+# Tokens of workers that stopped saving are removed by a TTL index after this long
+RESUME_TOKEN_RETENTION = timedelta(days=7)
+
+# The stored resume token is no longer in the oplog
+HISTORY_LOST_CODES = (280, 286)
+# $changeStream on a standalone server
+NOT_REPLICA_SET_CODE = 40573
+
+
+@dataclass
+class ChangeEvent:
+    """A write to one document, or to a whole collection when document_id is None"""
+    collection: str
+    operation: str
+    document_id: Any = None
+    # New values of the fields an update set; empty for other operations
+    updated_fields: Dict[str, Any] = field(default_factory=dict)
+    removed_fields: List[str] = field(default_factory=list)
+    
+    @classmethod
+    def from_change(cls, change: Dict[str, Any]) -> "ChangeEvent":
+        description = change.get("updateDescription") or {}
+        return cls(
+            collection=(change.get("ns") or {}).get("coll"),
+            operation=change["operationType"],
+            document_id=(change.get("documentKey") or {}).get("_id"),
+            updated_fields=description.get("updatedFields") or {},
+            removed_fields=description.get("removedFields") or []
+        )
+    
+    @classmethod
+    def everything(cls, collection: str) -> "ChangeEvent":
+        """Event telling listeners their whole collection may have changed"""
+        return cls(collection=collection, operation="invalidate_all")
+
+
+ChangeListener = Callable[[ChangeEvent], Optional[Awaitable[None]]]
+
+
+class ChangeStreamSubscriber:
+    """Watch collections and publish every change to the listeners registered for it"""
+    
+    def __init__(
+        self,
+        name: str,
+        collections: List[str],
+        max_await_ms: int,
+        token_save_interval_seconds: float,
+        retry_seconds: float,
+        worker_id: Optional[str] = None
+    ):
+        self.name = name
+        # Workers watch independently, so each keeps its own position
+        self.token_id = f"{name}:{worker_id or f'{socket.gethostname()}:{os.getpid()}'}"
+        self.collections = collections
+        self.max_await_ms = max_await_ms
+        self.token_save_interval_seconds = token_save_interval_seconds
+        self.retry_seconds = retry_seconds
+        self._listeners: Dict[str, List[ChangeListener]] = {collection: [] for collection in collections}
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token: Optional[Dict[str, Any]] = None
+        self._saved_token: Optional[Dict[str, Any]] = None
+        self._saved_at = 0.0
+        self.state = "stopped"
+        self.resumed = False
+        self.events: Dict[str, int] = {collection: 0 for collection in collections}
+        self.listener_errors = 0
+        self.restarts = 0
+        self.history_lost = 0
+        self.last_event_at: Optional[datetime] = None
+    
+    def subscribe(self, collection: str, listener: ChangeListener) -> None:
+        """Call listener(event) for every change to collection; it may return an awaitable"""
+        if collection not in self._listeners:
+            raise ValueError(f"{collection} is not a watched collection")
+        self._listeners[collection].append(listener)
+    
+    async def start(self, db: AsyncIOMotorDatabase) -> None:
+        """Load the stored resume token, open the stream and keep watching in the background"""
+        if settings.database_backend != "mongo":
+            self.state = "unsupported"
+            logger.info("Change streams need MongoDB; cross-worker cache invalidation is off")
+            return
+        
+        self._db = db
+        stored = await db[RESUME_TOKENS_COLLECTION].find_one({"_id": self.token_id})
+        if stored is not None:
+            self._resume_token = self._saved_token = stored["token"]
+            self.resumed = True
+        self.state = "starting"
+        
+        # Open the cursor before returning, so writes made while callers load
+        # their caches are already covered by the stream
+        stream = None
+        try:
+            stream = await self._open()
+        except PyMongoError as e:
+            # _run opens again and handles the error
+            logger.warning(f"⚠️ Could not open change stream at startup: {e}")
+        self._task = asyncio.create_task(self._run(stream))
+    
+    async def stop(self) -> None:
+        """Stop watching and store the last resume token"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self._save_token(force=True)
+        self.state = "stopped"
+    
+    async def _open(self) -> AsyncIOMotorChangeStream:
+        """Open a change stream from the last resume token"""
+        stream = self._db.watch(
+            [{"$match": {"ns.coll": {"$in": self.collections}}}],
+            resume_after=self._resume_token,
+            max_await_time_ms=self.max_await_ms
+        )
+        # Motor only runs the aggregate on entry; this fixes the stream's start point
+        return await stream.__aenter__()
+    
+    async def _run(self, stream: Optional[AsyncIOMotorChangeStream] = None) -> None:
+        """Keep a change stream open, reopening it from the last token after errors"""
+        while True:
+            try:
+                if stream is None:
+                    stream = await self._open()
+                async with stream:
+                    self.state = "watching"
+                    logger.info(f"👀 Watching {', '.join(self.collections)} for cache invalidation")
+                    while stream.alive:
+                        change = await stream.try_next()
+                        if change is not None:
+                            await self._publish(ChangeEvent.from_change(change))
+                        # Advances on empty batches too, so an idle stream keeps a fresh token
+                        self._resume_token = stream.resume_token
+                        await self._save_token()
+            except asyncio.CancelledError:
+                if stream is not None:
+                    await stream.close()
+                raise
+            except OperationFailure as e:
+                if e.code == NOT_REPLICA_SET_CODE:
+                    self.state = "unsupported"
+                    logger.warning("⚠️ MongoDB is not a replica set; cross-worker cache invalidation is off")
+                    return
+                if e.code in HISTORY_LOST_CODES:
+                    # Changes since the token are gone: assume everything changed and start from now
+                    self.history_lost += 1
+                    logger.warning(f"⚠️ Change stream history lost, invalidating all watched caches: {e}")
+                    self._resume_token = None
+                    for collection in self.collections:
+                        await self._publish(ChangeEvent.everything(collection))
+                    await self._clear_token()
+                    continue
+                await self._retry(e)
+            except PyMongoError as e:
+                await self._retry(e)
+            finally:
+                stream = None
+            
+            if self.state == "watching":
+                # The stream was invalidated (collection or database dropped)
+                for collection in self.collections:
+                    await self._publish(ChangeEvent.everything(collection))
+                self._resume_token = None
+                await self._clear_token()
+    
+    async def _retry(self, error: Exception) -> None:
+        self.state = "retrying"
+        self.restarts += 1
+        logger.warning(f"⚠️ Change stream error, reopening in {self.retry_seconds}s: {error}")
+        await asyncio.sleep(self.retry_seconds)
+    
+    async def _publish(self, event: ChangeEvent) -> None:
+        """Deliver an event to every listener of its collection; listener errors are logged and skipped"""
+        if event.operation == "invalidate":
+            return  # Followed by the stream closing, handled in _run
+        if event.collection in self.events:
+            self.events[event.collection] += 1
+        self.last_event_at = datetime.utcnow()
+        
+        for listener in self._listeners.get(event.collection, []):
+            try:
+                result = listener(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                self.listener_errors += 1
+                logger.error(f"Error in {event.collection} change listener: {e}")
+    
+    async def _save_token(self, force: bool = False) -> None:
+        """Store the resume token at most every token_save_interval_seconds"""
+        if self._resume_token is None or self._resume_token == self._saved_token:
+            return
+        if not force and time.monotonic() - self._saved_at < self.token_save_interval_seconds:
+            return
+        try:
+            now = datetime.utcnow()
+            await self._db[RESUME_TOKENS_COLLECTION].update_one(
+                {"_id": self.token_id},
+                {"$set": {"token": self._resume_token, "updated_at": now, "expires_at": now + RESUME_TOKEN_RETENTION}},
+                upsert=True
+            )
+            self._saved_token = self._resume_token
+            self._saved_at = time.monotonic()
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Could not store change stream resume token: {e}")
+    
+    async def _clear_token(self) -> None:
+        try:
+            await self._db[RESUME_TOKENS_COLLECTION].delete_one({"_id": self.token_id})
+            self._saved_token = None
+        except PyMongoError as e:
+            logger.warning(f"⚠️ Could not clear change stream resume token: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get subscriber state and counters"""
+        return {
+            "state": self.state,
+            "token_id": self.token_id,
+            "resumed_from_stored_token": self.resumed,
+            "events": dict(self.events),
+            "listeners": {collection: len(listeners) for collection, listeners in self._listeners.items()},
+            "listener_errors": self.listener_errors,
+            "restarts": self.restarts,
+            "history_lost": self.history_lost,
+            "last_event_at": self.last_event_at.isoformat() if self.last_event_at else None
+        }
+
+
+# Create global change stream subscriber
+change_stream = ChangeStreamSubscriber(
+    name=settings.change_stream_name,
+    collections=settings.change_stream_collections,
+    max_await_ms=settings.change_stream_max_await_ms,
+    token_save_interval_seconds=settings.change_stream_token_save_interval_seconds,
+    retry_seconds=settings.change_stream_retry_seconds,
+    worker_id=settings.change_stream_worker_id
+)
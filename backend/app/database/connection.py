@@ -3,37 +3,92 @@ Database connection module
 Handles MongoDB connection using Motor (async MongoDB driver)
 """
 
+import asyncio
 import logging
-from typing import Optional
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorClientSession, AsyncIOMotorDatabase
 from pymongo.errors import ServerSelectionTimeoutError
+from pymongo.read_preferences import (
+    Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred, _ServerMode
+)
 
 from app.config import settings
+from app.database.memory import MemoryClient
+from app.database.indexes import IndexPlan, IndexSpec, plan_index_changes, apply_index_changes
+from app.database.monitoring import command_timing_listener, pool_monitor
+from app.database.slow_queries import slow_query_log
 
 logger = logging.getLogger(__name__)
 
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest
+}
+
+def build_read_preference(mode: str, max_staleness_seconds: Optional[int]) -> _ServerMode:
+    """Build a read preference from a mode name and an optional staleness bound"""
+    if mode not in READ_PREFERENCES:
+        raise ValueError(f"Unknown read preference: {mode}")
+    if mode == "primary" or max_staleness_seconds is None:
+        return READ_PREFERENCES[mode]()
+    return READ_PREFERENCES[mode](max_staleness=max_staleness_seconds)
+
+class IndexBuildStatus:
+    """Progress of the startup index check and any background builds"""
+    
+    def __init__(self):
+        self.state = "pending"
+        self.pending: List[str] = []
+        # Indexes whose definition differs from the manifest; rebuilt only by manage_indexes.py
+        self.conflicts: List[str] = []
+        self.created = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "pending": self.pending,
+            "conflicts": self.conflicts,
+            "created": self.created,
+            "error": self.error,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
 class Database:
     """Database connection manager"""
     
     def __init__(self):
         self.client: Optional["AsyncIOMotorClient"] = None
         self.database: Optional["AsyncIOMotorDatabase"] = None
+        self.analytics_database: Optional["AsyncIOMotorDatabase"] = None
+        self.index_status = IndexBuildStatus()
+        self._index_task: Optional[asyncio.Task] = None
         
     async def connect(self) -> None:
         """Connect to MongoDB"""
         try:
-            self.client = AsyncIOMotorClient(
-                settings.mongodb_url,
-                serverSelectionTimeoutMS=5000,
-                maxPoolSize=50,
-                minPoolSize=10
-            )
+            self.client = self._create_client()
             
             # Test the connection
             await self.client.admin.command('ismaster')
             self.database = self.client[settings.database_name]
+            self.analytics_database = self.database.with_options(
+                read_preference=build_read_preference(
+                    settings.analytics_read_preference,
+                    settings.analytics_max_staleness_seconds
+                )
+            )
             
-            # Create indexes for better performance
+            # Diff indexes now; any builds run in the background
             await self._create_indexes()
             
             logger.info(f"✅ Connected to MongoDB database: {settings.database_name}")
@@ -45,42 +100,111 @@ class Database:
             logger.error(f"❌ Unexpected error connecting to MongoDB: {e}")
             raise
     
+    def _create_client(self) -> AsyncIOMotorClient:
+        """Client for the configured backend"""
+        if settings.database_backend == "memory":
+            logger.info("🧪 Using the in-memory database backend")
+            return MemoryClient()
+        if settings.database_backend != "mongo":
+            raise ValueError(f"Unknown database backend: {settings.database_backend}")
+        return AsyncIOMotorClient(
+            settings.mongodb_url,
+            serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+            maxPoolSize=settings.mongo_max_pool_size,
+            minPoolSize=settings.mongo_min_pool_size,
+            waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+            event_listeners=self._event_listeners()
+        )
+    
+    def _event_listeners(self) -> list:
+        """Command listeners enabled in settings"""
+        listeners = [pool_monitor]
+        if settings.db_command_monitoring_enabled:
+            listeners.append(command_timing_listener)
+        if slow_query_log.enabled:
+            listeners.append(slow_query_log)
+        return listeners
+    
+    async def ping(self, timeout_seconds: float) -> float:
+        """Round-trip a ping to the server and return the latency in milliseconds"""
+        if self.client is None:
+            raise RuntimeError("Database not initialized. Call init_database() first.")
+        started = time.perf_counter()
+        await asyncio.wait_for(self.client.admin.command("ping"), timeout=timeout_seconds)
+        return (time.perf_counter() - started) * 1000
+    
     async def disconnect(self) -> None:
         """Disconnect from MongoDB"""
+        if self._index_task is not None and not self._index_task.done():
+            self._index_task.cancel()
+            try:
+                await self._index_task
+            except asyncio.CancelledError:
+                pass
+        self._index_task = None
+        
         if self.client:
             self.client.close()
             logger.info("📤 Disconnected from MongoDB")
     
     async def _create_indexes(self) -> None:
-        """Create database indexes for optimal performance"""
+        """Compare existing indexes with the manifest and build any missing ones in the background"""
+        status = self.index_status
+        status.started_at = datetime.utcnow()
         try:
-            # Users collection indexes
-            await self.database.users.create_index("email", unique=True)
-            await self.database.users.create_index("username", unique=True)
-            await self.database.users.create_index([("created_at", -1)])
-            
-            # Tickets collection indexes
-            await self.database.tickets.create_index([("created_at", -1)])
-            await self.database.tickets.create_index("status")
-            await self.database.tickets.create_index("priority")
-            await self.database.tickets.create_index("assigned_to")
-            await self.database.tickets.create_index("created_by")
-            await self.database.tickets.create_index([("title", "text"), ("description", "text")])
-            
-            # Messages collection indexes
-            await self.database.messages.create_index([("created_at", -1)])
-            await self.database.messages.create_index("ticket_id")
-            await self.database.messages.create_index("sender_id")
-            
-            # Notifications collection indexes
-            await self.database.notifications.create_index([("created_at", -1)])
-            await self.database.notifications.create_index("user_id")
-            await self.database.notifications.create_index("is_read")
-            
-            logger.info("📊 Database indexes created successfully")
-            
+            status.state = "checking"
+            plan = await plan_index_changes(self.database)
+        except Exception as e:
+            status.state = "failed"
+            status.error = str(e)
+            status.finished_at = datetime.utcnow()
+            logger.warning(f"⚠️ Error checking indexes: {e}")
+            return
+        
+        # Dropping a live index (a unique one especially) to rebuild it is left to an operator
+        status.conflicts = [f"{spec.collection}.{spec.name}" for spec in plan.conflicting]
+        if status.conflicts:
+            logger.warning(
+                f"⚠️ Indexes differ from the manifest: {', '.join(status.conflicts)}. "
+                "Run manage_indexes.py --apply to rebuild them"
+            )
+        
+        missing = plan.missing
+        if not missing:
+            status.state = "ready"
+            status.finished_at = datetime.utcnow()
+            logger.info("📊 Database indexes up to date" if not status.conflicts else "📊 No missing database indexes")
+            return
+        
+        status.state = "building"
+        status.pending = [f"{spec.collection}.{spec.name}" for spec in missing]
+        self._index_task = asyncio.create_task(self._build_indexes(plan))
+        logger.info(f"📊 Building {len(missing)} indexes in the background")
+    
+    async def _build_indexes(self, plan: IndexPlan) -> None:
+        """Apply an index plan and record progress on index_status"""
+        status = self.index_status
+        
+        def on_created(spec: IndexSpec) -> None:
+            status.pending.remove(f"{spec.collection}.{spec.name}")
+            status.created += 1
+        
+        try:
+            # Conflicting and obsolete indexes are only dropped by the manage_indexes.py command
+            await apply_index_changes(
+                self.database, plan, drop_obsolete=False, rebuild_conflicting=False, on_created=on_created
+            )
+            status.state = "ready"
+            logger.info(f"📊 Database indexes ready ({status.created} created)")
+        except asyncio.CancelledError:
+            status.state = "cancelled"
+            raise
         except Exception as e:
+            status.state = "failed"
+            status.error = str(e)
             logger.warning(f"⚠️ Error creating indexes: {e}")
+        finally:
+            status.finished_at = datetime.utcnow()
 
 # Create global database instance
 db = Database()
@@ -97,4 +221,18 @@ def get_database() -> AsyncIOMotorDatabase:
     """Get database instance"""
     if db.database is None:
         raise RuntimeError("Database not initialized. Call init_database() first.")
-    return db.database 
\ No newline at end of file
+    return db.database 
+
+def get_analytics_database() -> AsyncIOMotorDatabase:
+    """Get database instance for heavy read-only stats queries, using the analytics read preference"""
+    if db.analytics_database is None:
+        raise RuntimeError("Database not initialized. Call init_database() first.")
+    return db.analytics_database
+
+@asynccontextmanager
+async def causal_session() -> AsyncIterator[AsyncIOMotorClientSession]:
+    """Causally consistent session so reads after a write observe that write"""
+    if db.client is None:
+        raise RuntimeError("Database not initialized. Call init_database() first.")
+    async with await db.client.start_session(causal_consistency=True) as session:
+        yield session
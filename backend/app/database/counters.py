@@ -0,0 +1,184 @@
+"""
+Write-behind buffer for denormalized counters
+Increments are merged per document in memory and flushed as one bulk write per collection
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.database.connection import get_database
+
+logger = logging.getLogger(__name__)
+
+
+class PendingUpdate:
+    """Merged increments and newest-value fields for one document"""
+    
+    def __init__(self):
+        self.inc: Dict[str, int] = defaultdict(int)
+        self.max: Dict[str, Any] = {}
+    
+    def merge(self, inc: Dict[str, int], max_fields: Dict[str, Any]) -> None:
+        for field, amount in inc.items():
+            self.inc[field] += amount
+        for field, value in max_fields.items():
+            if field not in self.max or self.max[field] < value:
+                self.max[field] = value
+    
+    def to_update(self) -> Dict[str, Any]:
+        update = {}
+        inc = {field: amount for field, amount in self.inc.items() if amount != 0}
+        if inc:
+            update["$inc"] = inc
+        if self.max:
+            update["$max"] = dict(self.max)
+        return update
+
+
+class CounterBuffer:
+    """Merge counter increments per document and flush them periodically or when the buffer fills"""
+    
+    def __init__(self, flush_interval_seconds: float, max_pending: int):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending = max_pending
+        # (collection, _id) -> pending update
+        self._pending: Dict[Tuple[str, Any], PendingUpdate] = {}
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._size_flush: Optional[asyncio.Task] = None
+        self._flush_listeners: List[Callable[[str, List[Any]], None]] = []
+        self.increments = 0
+        self.flushes = 0
+        self.writes = 0
+        self.errors = 0
+    
+    def increment(
+        self,
+        collection: str,
+        document_id: Any,
+        inc: Dict[str, int],
+        max_fields: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Buffer $inc amounts and $max values for a document"""
+        key = (collection, document_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = PendingUpdate()
+        pending.merge(inc, max_fields or {})
+        self.increments += 1
+        
+        if len(self._pending) >= self.max_pending and (self._size_flush is None or self._size_flush.done()):
+            self._size_flush = asyncio.create_task(self.flush())
+    
+    def on_flush(self, listener: Callable[[str, List[Any]], None]) -> None:
+        """Call listener(collection, document ids) after each successful bulk write"""
+        self._flush_listeners.append(listener)
+    
+    def _requeue(self, pending: Dict[Tuple[str, Any], PendingUpdate]) -> None:
+        """Merge updates that failed to write back into the buffer"""
+        for key, update in pending.items():
+            current = self._pending.get(key)
+            if current is None:
+                self._pending[key] = update
+            else:
+                current.merge(update.inc, update.max)
+    
+    async def flush(self) -> int:
+        """Write all buffered updates with one bulk write per collection"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            
+            pending, self._pending = self._pending, {}
+            # collection -> pending keys, in the same order as the operations
+            by_collection: Dict[str, List[Tuple[str, Any]]] = defaultdict(list)
+            for key, update in pending.items():
+                if update.to_update():
+                    by_collection[key[0]].append(key)
+            
+            written = 0
+            db = get_database()
+            for collection, keys in by_collection.items():
+                operations = [UpdateOne({"_id": key[1]}, pending[key].to_update()) for key in keys]
+                failed: List[Tuple[str, Any]] = []
+                try:
+                    await db[collection].bulk_write(operations, ordered=False)
+                except BulkWriteError as e:
+                    # Unordered: every update not listed in writeErrors was applied
+                    failed_indexes = {error["index"] for error in e.details.get("writeErrors", [])}
+                    failed = [keys[index] for index in sorted(failed_indexes)]
+                    self.errors += 1
+                    logger.error(f"Error flushing {len(failed)} of {len(keys)} {collection} counters: {e}")
+                except Exception as e:
+                    # Nothing is known to have been applied
+                    failed = keys
+                    self.errors += 1
+                    logger.error(f"Error flushing {collection} counters: {e}")
+                
+                # Retry on the next flush
+                self._requeue({key: pending[key] for key in failed})
+                failed_keys = set(failed)
+                document_ids = [key[1] for key in keys if key not in failed_keys]
+                written += len(document_ids)
+                if not document_ids:
+                    continue
+                for listener in self._flush_listeners:
+                    try:
+                        listener(collection, document_ids)
+                    except Exception as e:
+                        logger.error(f"Error in {collection} counter flush listener: {e}")
+            
+            self.flushes += 1
+            self.writes += written
+            return written
+    
+    async def _run(self) -> None:
+        """Flush periodically until cancelled"""
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+    
+    def start(self) -> None:
+        """Start the periodic flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self, attempts: int = 3) -> None:
+        """Stop the periodic flush task and write everything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        for attempt in range(attempts):
+            await self.flush()
+            if not self._pending:
+                return
+            await asyncio.sleep(0.5 * (attempt + 1))
+        logger.error(f"❌ {len(self._pending)} counter updates could not be written at shutdown")
+    
+    def stats(self) -> Dict[str, int]:
+        """Get buffer counters"""
+        return {
+            "pending": len(self._pending),
+            "increments": self.increments,
+            "flushes": self.flushes,
+            "writes": self.writes,
+            "errors": self.errors
+        }
+
+
+# Create global counter buffer
+counter_buffer = CounterBuffer(
+    flush_interval_seconds=settings.counter_flush_interval_seconds,
+    max_pending=settings.counter_flush_max_pending
+)
@@ -0,0 +1,174 @@
+"""
+Declarative index manifest
+Every index the application relies on is declared here and diffed against the server
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, TEXT
+
+logger = logging.getLogger(__name__)
+
+# Index options that change index behavior and must match for an index to be reused
+COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """A single desired index"""
+    collection: str
+    keys: Tuple[Tuple[str, Any], ...]
+    options: Dict[str, Any] = field(default_factory=dict, hash=False)
+    
+    @property
+    def name(self) -> str:
+        """Index name, matching the server's default naming"""
+        return self.options.get("name") or "_".join(f"{key}_{direction}" for key, direction in self.keys)
+    
+    @property
+    def is_text(self) -> bool:
+        return any(direction == TEXT for _, direction in self.keys)
+    
+    def matches(self, existing: Dict[str, Any]) -> bool:
+        """Check whether an index returned by listIndexes satisfies this spec"""
+        if existing.get("name") != self.name:
+            return False
+        if self.is_text:
+            # Text index keys are stored as _fts/_ftsx with the fields in weights
+            return set(existing.get("weights", {})) == {key for key, _ in self.keys}
+        if list(existing["key"].items()) != list(self.keys):
+            return False
+        return all(existing.get(option) == self.options.get(option) for option in COMPARED_OPTIONS)
+    
+    def create_kwargs(self) -> Dict[str, Any]:
+        return {**self.options, "name": self.name}
+
+
+def index(collection: str, *keys: Tuple[str, Any], **options: Any) -> IndexSpec:
+    return IndexSpec(collection, tuple(keys), options)
+
+
+INDEX_MANIFEST: List[IndexSpec] = [
+    # Users: unique identity lookups, admin listing (optionally by role) newest first, agent lookups
+    index("users", ("email", ASCENDING), unique=True),
+    index("users", ("username", ASCENDING), unique=True),
+    index("users", ("created_at", DESCENDING)),
+    index("users", ("role", ASCENDING), ("created_at", DESCENDING)),
+    index("users", ("role", ASCENDING), ("status", ASCENDING)),
+    
+    # Tickets: customer listing (created_by + created_at sort), filtered listings and stats counts
+    index("tickets", ("created_at", DESCENDING)),
+    index("tickets", ("created_by", ASCENDING), ("created_at", DESCENDING)),
+    index("tickets", ("status", ASCENDING), ("created_at", DESCENDING)),
+    index("tickets", ("priority", ASCENDING)),
+    index("tickets", ("assigned_to", ASCENDING)),
+    index("tickets", ("title", TEXT), ("description", TEXT)),
+    
+    # Messages: per-ticket pages in chat order, recent activity counts, sender lookups
+    index("messages", ("ticket_id", ASCENDING), ("created_at", ASCENDING)),
+    index("messages", ("created_at", DESCENDING)),
+    index("messages", ("sender_id", ASCENDING)),
+    
+    # Notifications: per-user listing (optionally unread only) newest first, admin views and stats
+    index("notifications", ("user_id", ASCENDING), ("is_read", ASCENDING), ("created_at", DESCENDING)),
+    index("notifications", ("user_id", ASCENDING), ("created_at", DESCENDING)),
+    index("notifications", ("is_read", ASCENDING)),
+    index("notifications", ("created_at", DESCENDING)),
+    
+    # API keys
+    index("api_keys", ("key_digest", ASCENDING), unique=True),
+    index("api_keys", ("user_id", ASCENDING)),
+    
+    # Login attempts: sliding-window lookups and TTL expiry
+    index("login_attempts", ("key", ASCENDING), ("attempted_at", DESCENDING)),
+    index("login_attempts", ("expires_at", ASCENDING), expireAfterSeconds=0),
+    
+    # Change stream resume tokens of workers that are gone
+    index("change_stream_tokens", ("expires_at", ASCENDING), expireAfterSeconds=0),
+]
+
+
+@dataclass
+class IndexPlan:
+    """Differences between the manifest and the indexes on the server"""
+    to_create: List[IndexSpec] = field(default_factory=list)
+    to_drop: List[Tuple[str, str]] = field(default_factory=list)
+    unchanged: List[IndexSpec] = field(default_factory=list)
+    
+    @property
+    def is_empty(self) -> bool:
+        return not self.to_create and not self.to_drop
+    
+    @property
+    def conflicting(self) -> List[IndexSpec]:
+        """Indexes that exist with a different definition and must be dropped to rebuild"""
+        dropped = set(self.to_drop)
+        return [spec for spec in self.to_create if (spec.collection, spec.name) in dropped]
+    
+    @property
+    def missing(self) -> List[IndexSpec]:
+        """Indexes that do not exist at all"""
+        dropped = set(self.to_drop)
+        return [spec for spec in self.to_create if (spec.collection, spec.name) not in dropped]
+
+
+async def plan_index_changes(db: AsyncIOMotorDatabase, manifest: List[IndexSpec] = INDEX_MANIFEST) -> IndexPlan:
+    """Compare the manifest against listIndexes for every collection it covers"""
+    plan = IndexPlan()
+    collections = sorted({spec.collection for spec in manifest})
+    
+    for collection in collections:
+        existing = {
+            info["name"]: info
+            for info in await db[collection].list_indexes().to_list(None)
+        }
+        wanted = [spec for spec in manifest if spec.collection == collection]
+        
+        for spec in wanted:
+            current = existing.get(spec.name)
+            if current is not None and spec.matches(current):
+                plan.unchanged.append(spec)
+                continue
+            if current is not None:
+                # Same name but different definition: rebuild it
+                plan.to_drop.append((collection, spec.name))
+            plan.to_create.append(spec)
+        
+        wanted_names = {spec.name for spec in wanted}
+        for name in existing:
+            if name != "_id_" and name not in wanted_names:
+                plan.to_drop.append((collection, name))
+    
+    return plan
+
+
+async def apply_index_changes(
+    db: AsyncIOMotorDatabase,
+    plan: IndexPlan,
+    drop_obsolete: bool = True,
+    rebuild_conflicting: bool = True,
+    on_created: Optional[Callable[[IndexSpec], None]] = None
+) -> None:
+    """Build missing indexes, optionally rebuild conflicting and drop obsolete ones; on_created is called after each build"""
+    rebuilt = {(spec.collection, spec.name) for spec in plan.to_create}
+    
+    # Conflicting definitions must be dropped before they can be recreated
+    if rebuild_conflicting:
+        for collection, name in plan.to_drop:
+            if (collection, name) in rebuilt:
+                await db[collection].drop_index(name)
+                logger.info(f"Dropped index {collection}.{name} for rebuild")
+    
+    for spec in plan.to_create if rebuild_conflicting else plan.missing:
+        await db[spec.collection].create_index(list(spec.keys), **spec.create_kwargs())
+        logger.info(f"Created index {spec.collection}.{spec.name}")
+        if on_created is not None:
+            on_created(spec)
+    
+    if drop_obsolete:
+        for collection, name in plan.to_drop:
+            if (collection, name) not in rebuilt:
+                await db[collection].drop_index(name)
+                logger.info(f"Dropped obsolete index {collection}.{name}")
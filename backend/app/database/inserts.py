@@ -0,0 +1,122 @@
+"""
+Group-commit insert batching
+Inserts arriving within a short window are written with one insert_many per collection;
+each caller gets its own document id back once the batch is acknowledged
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.database.connection import get_database
+
+logger = logging.getLogger(__name__)
+
+
+class InsertBatcher:
+    """Gather concurrent inserts into insert_many calls, flushing after a window or at a size limit"""
+    
+    def __init__(self, window_ms: float, max_batch_size: int):
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        # collection -> [(document, future)]
+        self._pending: Dict[str, List[Tuple[Dict[str, Any], asyncio.Future]]] = defaultdict(list)
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._flushes: set = set()
+        self.inserts = 0
+        self.batched = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.errors = 0
+    
+    async def insert(self, collection: str, document: Dict[str, Any]) -> ObjectId:
+        """Insert a document as part of the next batch and return its _id; the document gets its _id set"""
+        document.setdefault("_id", ObjectId())
+        future = asyncio.get_running_loop().create_future()
+        queue = self._pending[collection]
+        queue.append((document, future))
+        self.inserts += 1
+        
+        if len(queue) >= self.max_batch_size:
+            self._schedule_flush(collection)
+        elif len(queue) == 1:
+            self._timers[collection] = asyncio.get_running_loop().call_later(
+                self.window_ms / 1000, self._schedule_flush, collection
+            )
+        
+        await future
+        return document["_id"]
+    
+    def _schedule_flush(self, collection: str) -> None:
+        task = asyncio.ensure_future(self.flush(collection))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+    
+    async def flush(self, collection: str) -> None:
+        """Write everything queued for a collection with one insert_many"""
+        timer = self._timers.pop(collection, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(collection, [])
+        if not batch:
+            return
+        
+        self.batches += 1
+        self.batched += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            # Unordered so one bad document does not fail the rest of the batch
+            await get_database()[collection].insert_many([document for document, _ in batch], ordered=False)
+            failures = {}
+        except BulkWriteError as e:
+            failures = {error["index"]: error for error in e.details.get("writeErrors", [])}
+            if not failures:
+                failures = {index: e for index in range(len(batch))}
+        except Exception as e:
+            failures = {index: e for index in range(len(batch))}
+        
+        if failures:
+            self.errors += len(failures)
+            logger.error(f"❌ {len(failures)} of {len(batch)} {collection} inserts failed")
+        
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            failure = failures.get(index)
+            if failure is None:
+                future.set_result(None)
+            elif isinstance(failure, Exception):
+                future.set_exception(failure)
+            else:
+                future.set_exception(BulkWriteError({"writeErrors": [failure]}))
+    
+    async def stop(self) -> None:
+        """Write every queued insert"""
+        for collection in list(self._pending):
+            await self.flush(collection)
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get batching counters"""
+        return {
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "pending": sum(len(queue) for queue in self._pending.values()),
+            "inserts": self.inserts,
+            "batches": self.batches,
+            "largest_batch": self.largest_batch,
+            "avg_batch_size": round(self.batched / self.batches, 2) if self.batches else 0,
+            "errors": self.errors
+        }
+
+
+# Create global insert batcher
+insert_batcher = InsertBatcher(
+    window_ms=settings.insert_batch_window_ms,
+    max_batch_size=settings.insert_batch_max_size
+)
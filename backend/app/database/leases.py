@@ -0,0 +1,187 @@
+"""
+Leases for singleton background jobs
+A lease is one document in the leases collection taken with an atomic find_one_and_update.
+It expires unless its holder renews it, and every acquisition gets a larger fencing token so
+work done under a lease that has since been lost can be rejected downstream.
+Expiry uses each replica's clock; keep TTLs well above the expected clock skew.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from app.config import settings
+from app.database.connection import get_database
+
+logger = logging.getLogger(__name__)
+
+LEASES_COLLECTION = "leases"
+
+
+class LeaseLost(Exception):
+    """The lease expired or was taken over while its job was still running"""
+
+
+class Lease:
+    """A held lease; token is the fencing token for this acquisition"""
+    
+    def __init__(self, name: str, owner: str, token: int, ttl_seconds: float, expires_at: datetime):
+        self.name = name
+        self.owner = owner
+        self.token = token
+        self.ttl_seconds = ttl_seconds
+        self.expires_at = expires_at
+        self.lost = False
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "owner": self.owner,
+            "token": self.token,
+            "expires_at": self.expires_at.isoformat(),
+            "lost": self.lost
+        }
+
+
+class LeaseManager:
+    """Acquire, renew and release leases for this process"""
+    
+    def __init__(self, db: Optional[AsyncIOMotorDatabase] = None, owner: Optional[str] = None):
+        # Without a db the application database is used
+        self._db = db
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.held: Dict[str, Lease] = {}
+        self.acquired = 0
+        self.contended = 0
+        self.renewals = 0
+        self.lost = 0
+    
+    @property
+    def collection(self):
+        return (self._db if self._db is not None else get_database())[LEASES_COLLECTION]
+    
+    async def acquire(self, name: str, ttl_seconds: Optional[float] = None) -> Optional[Lease]:
+        """Take a lease if it is free or expired; None when another owner holds it"""
+        ttl_seconds = ttl_seconds or settings.lease_default_ttl_seconds
+        now = datetime.utcnow()
+        try:
+            # Matches a missing or expired lease; when another owner holds it the
+            # filter misses and the upsert collides on _id
+            document = await self.collection.find_one_and_update(
+                {"_id": name, "$or": [{"expires_at": {"$lte": now}}, {"expires_at": None}]},
+                {
+                    "$set": {"owner": self.owner, "acquired_at": now, "expires_at": now + timedelta(seconds=ttl_seconds)},
+                    "$inc": {"token": 1}
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            self.contended += 1
+            return None
+        
+        lease = Lease(name, self.owner, document["token"], ttl_seconds, document["expires_at"])
+        self.held[name] = lease
+        self.acquired += 1
+        logger.info(f"🔒 Acquired lease {name} (token {lease.token})")
+        return lease
+    
+    async def renew(self, lease: Lease) -> bool:
+        """Extend a lease; False, and the lease is marked lost, if it is no longer ours"""
+        now = datetime.utcnow()
+        document = await self.collection.find_one_and_update(
+            {"_id": lease.name, "owner": lease.owner, "token": lease.token, "expires_at": {"$gt": now}},
+            {"$set": {"expires_at": now + timedelta(seconds=lease.ttl_seconds), "renewed_at": now}},
+            return_document=ReturnDocument.AFTER
+        )
+        if document is None:
+            self._mark_lost(lease)
+            return False
+        lease.expires_at = document["expires_at"]
+        self.renewals += 1
+        return True
+    
+    async def release(self, lease: Lease) -> None:
+        """Give a lease up early; the document stays so fencing tokens keep increasing"""
+        self.held.pop(lease.name, None)
+        if lease.lost:
+            return
+        await self.collection.update_one(
+            {"_id": lease.name, "owner": lease.owner, "token": lease.token},
+            {"$set": {"expires_at": datetime.utcnow()}}
+        )
+        logger.info(f"🔓 Released lease {lease.name} (token {lease.token})")
+    
+    def _mark_lost(self, lease: Lease) -> None:
+        if not lease.lost:
+            lease.lost = True
+            self.lost += 1
+            self.held.pop(lease.name, None)
+            logger.warning(f"⚠️ Lost lease {lease.name} (token {lease.token})")
+    
+    async def _heartbeat(self, lease: Lease, interval_seconds: float, holder: asyncio.Task) -> None:
+        """Renew until cancelled; cancel the holder when the lease is lost"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                renewed = await self.renew(lease)
+            except PyMongoError as e:
+                logger.warning(f"⚠️ Could not renew lease {lease.name}: {e}")
+                if datetime.utcnow() < lease.expires_at:
+                    continue  # Still ours until it expires; try again
+                self._mark_lost(lease)
+                renewed = False
+            if not renewed:
+                holder.cancel()
+                return
+    
+    @asynccontextmanager
+    async def hold(self, name: str, ttl_seconds: Optional[float] = None) -> AsyncIterator[Optional[Lease]]:
+        """Hold a lease for the block, renewing every third of its TTL; yields None if another replica holds it"""
+        lease = await self.acquire(name, ttl_seconds)
+        if lease is None:
+            yield None
+            return
+        
+        holder = asyncio.current_task()
+        heartbeat = asyncio.create_task(self._heartbeat(lease, lease.ttl_seconds / 3, holder))
+        try:
+            yield lease
+        except asyncio.CancelledError:
+            # The heartbeat cancels the block when renewal fails
+            if not lease.lost:
+                raise
+            holder.uncancel()
+            raise LeaseLost(f"Lease {name} was lost while its job was running")
+        finally:
+            heartbeat.cancel()
+            try:
+                await heartbeat
+            except asyncio.CancelledError:
+                pass
+            try:
+                await self.release(lease)
+            except PyMongoError as e:
+                logger.warning(f"⚠️ Could not release lease {name}; it expires at {lease.expires_at}: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get lease counters and the leases this process holds"""
+        return {
+            "owner": self.owner,
+            "held": {name: lease.to_dict() for name, lease in self.held.items()},
+            "acquired": self.acquired,
+            "contended": self.contended,
+            "renewals": self.renewals,
+            "lost": self.lost
+        }
+
+
+# Create global lease manager
+lease_manager = LeaseManager()
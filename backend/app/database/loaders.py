@@ -0,0 +1,168 @@
+"""
+Request-scoped batch loaders
+Lookups by _id made during one event-loop tick are merged into a single $in query per
+collection and memoized for the rest of the request
+"""
+
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Union
+from bson import ObjectId
+
+from app.config import settings
+from app.database.change_streams import ChangeEvent, change_stream
+from app.database.connection import get_database
+from app.database.counters import counter_buffer
+from app.models.projections import USER_CONTACT_PROJECTION
+from app.utils.cache import VersionedCache
+
+
+class BatchLoader:
+    """Batch and memoize _id lookups on one collection"""
+    
+    def __init__(
+        self,
+        collection: str,
+        projection: Optional[Dict[str, Any]] = None,
+        cache: Optional[VersionedCache] = None
+    ):
+        self.collection = collection
+        self.projection = projection
+        # Shared cross-request cache consulted before querying
+        self.cache = cache
+        self._memo: Dict[ObjectId, asyncio.Future] = {}
+        self._queue: List[ObjectId] = []
+        self.queries = 0
+    
+    def load(self, key: Union[str, ObjectId]) -> "asyncio.Future[Optional[dict]]":
+        """Return a future for the document with this _id, or None if it does not exist"""
+        key = ObjectId(key) if not isinstance(key, ObjectId) else key
+        future = self._memo.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._memo[key] = future
+            cached = self.cache.get(str(key)) if self.cache is not None else None
+            if cached is not None:
+                future.set_result(cached)
+                return future
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                # Dispatch once the current tick has queued all its keys
+                loop.call_soon(lambda: asyncio.ensure_future(self._dispatch()))
+        return future
+    
+    async def load_many(self, keys: Iterable[Union[str, ObjectId]]) -> List[Optional[dict]]:
+        """Load several documents with at most one query"""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+    
+    async def attach(self, documents: List[dict], field: str, target: str) -> None:
+        """Set documents[target] to [referenced document] or [] like a $lookup on field would"""
+        keys = {document[field] for document in documents if document.get(field) is not None}
+        loaded = dict(zip(keys, await self.load_many(keys)))
+        for document in documents:
+            referenced = loaded.get(document.get(field))
+            document[target] = [referenced] if referenced is not None else []
+    
+    def prime(self, key: Union[str, ObjectId], document: Optional[dict]) -> None:
+        """Seed the memo with a document already loaded elsewhere"""
+        key = ObjectId(key) if not isinstance(key, ObjectId) else key
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(document)
+        self._memo[key] = future
+    
+    def clear(self, key: Union[str, ObjectId]) -> None:
+        """Forget a memoized document after it has been written"""
+        key = ObjectId(key) if not isinstance(key, ObjectId) else key
+        if key not in self._queue:
+            self._memo.pop(key, None)
+    
+    async def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        futures = {key: self._memo[key] for key in keys}
+        versions = {key: self.cache.version(str(key)) for key in keys} if self.cache is not None else {}
+        try:
+            db = get_database()
+            self.queries += 1
+            documents = await db[self.collection].find({"_id": {"$in": keys}}, self.projection).to_list(None)
+        except Exception as e:
+            for key, future in futures.items():
+                # Let a later load retry
+                self._memo.pop(key, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        by_id = {document["_id"]: document for document in documents}
+        for key, future in futures.items():
+            document = by_id.get(key)
+            if self.cache is not None and document is not None:
+                self.cache.set(str(key), versions[key], document)
+            if not future.done():
+                future.set_result(document)
+
+
+# Ticket documents shared across requests; every ticket write bumps the ticket's version
+ticket_cache = VersionedCache(settings.ticket_cache_max_size, settings.ticket_cache_ttl_seconds)
+
+
+def _counters_flushed(collection: str, document_ids: List[Any]) -> None:
+    """Buffered counter writes (message_count, updated_at) also change tickets"""
+    if collection == "tickets":
+        for document_id in document_ids:
+            ticket_cache.bump(str(document_id))
+
+
+counter_buffer.on_flush(_counters_flushed)
+
+
+def _ticket_changed(event: ChangeEvent) -> None:
+    """Ticket writes made by any worker"""
+    if event.document_id is None:
+        ticket_cache.clear()
+    else:
+        ticket_cache.bump(str(event.document_id))
+
+
+change_stream.subscribe("tickets", _ticket_changed)
+
+
+class RequestLoaders:
+    """The loaders available to one request"""
+    
+    def __init__(self):
+        self.users = BatchLoader("users", projection=USER_CONTACT_PROJECTION)
+        self.tickets = BatchLoader("tickets", cache=ticket_cache)
+
+
+_request_loaders: ContextVar[Optional[RequestLoaders]] = ContextVar("request_loaders", default=None)
+
+
+def get_loaders() -> RequestLoaders:
+    """Get the current request's loaders; outside a request each call gets fresh, unshared loaders"""
+    loaders = _request_loaders.get()
+    return loaders if loaders is not None else RequestLoaders()
+
+
+def ticket_written(ticket_id: Union[str, ObjectId]) -> None:
+    """Invalidate a ticket everywhere after writing it"""
+    ticket_cache.bump(str(ticket_id))
+    get_loaders().tickets.clear(ticket_id)
+
+
+class RequestLoaderMiddleware:
+    """ASGI middleware giving every HTTP request its own loaders"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        token = _request_loaders.set(RequestLoaders())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_loaders.reset(token)
@@ -0,0 +1,972 @@
+"""
+In-process MongoDB stand-in
+Implements the subset of the Motor client, database and collection API the application uses,
+so tests and endpoint benchmarks can run without a server (DATABASE_BACKEND=memory)
+"""
+
+import copy
+import re
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from bson import ObjectId
+from pymongo import ASCENDING, TEXT, DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+_MISSING = object()
+
+# BSON comparison order across types
+_TYPE_ORDER = [
+    (type(None), 1),
+    (bool, 8),
+    ((int, float), 2),
+    (str, 3),
+    (dict, 4),
+    (list, 5),
+    (ObjectId, 7),
+    (datetime, 9),
+]
+
+
+def _type_rank(value: Any) -> int:
+    for types, rank in _TYPE_ORDER:
+        if isinstance(value, types):
+            return rank
+    return 10
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    if value is _MISSING:
+        return (1, 0)
+    rank = _type_rank(value)
+    if rank == 1:
+        return (1, 0)
+    if rank in (4, 5):
+        return (rank, repr(value))
+    return (rank, value)
+
+
+def _compare(left: Any, right: Any) -> Optional[int]:
+    """Compare two values of the same BSON type family; None when they are not comparable"""
+    if left is _MISSING or _type_rank(left) != _type_rank(right) or _type_rank(left) in (4, 5):
+        return None
+    return (left > right) - (left < right)
+
+
+# Documents
+
+
+def _lookup_values(document: Any, path: str) -> List[Any]:
+    """All values at a dotted path, fanning out over arrays as queries do"""
+    values = [document]
+    for part in path.split("."):
+        next_values = []
+        for value in values:
+            if isinstance(value, dict):
+                if part in value:
+                    next_values.append(value[part])
+            elif isinstance(value, list):
+                if part.isdigit():
+                    if int(part) < len(value):
+                        next_values.append(value[int(part)])
+                else:
+                    next_values.extend(item[part] for item in value if isinstance(item, dict) and part in item)
+        values = next_values
+    return values
+
+
+def _get_value(document: Any, path: str) -> Any:
+    """Value at a dotted path for expressions, or _MISSING"""
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and not part.isdigit():
+            value = [item[part] for item in value if isinstance(item, dict) and part in item]
+        elif isinstance(value, list) and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+    return value
+
+
+def _set_value(document: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+
+def _unset_value(document: Dict[str, Any], path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(parts[-1], None)
+
+
+def _project(document: Dict[str, Any], projection: Optional[Union[Dict[str, Any], List[str]]]) -> Dict[str, Any]:
+    """Apply an inclusion or exclusion projection"""
+    if not projection:
+        return document
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    
+    include_id = bool(projection.get("_id", 1))
+    fields = {field: spec for field, spec in projection.items() if field != "_id"}
+    
+    if not fields:
+        # {"_id": 1} alone includes only _id; {"_id": 0} alone excludes only _id
+        if include_id:
+            return {"_id": document["_id"]} if "_id" in document else {}
+        projected = copy.deepcopy(document)
+        projected.pop("_id", None)
+        return projected
+    if all(not isinstance(spec, dict) and not spec for spec in fields.values()):
+        projected = copy.deepcopy(document)
+        for field in fields:
+            _unset_value(projected, field)
+        if not include_id:
+            projected.pop("_id", None)
+        return projected
+    
+    projected: Dict[str, Any] = {}
+    if include_id and "_id" in document:
+        projected["_id"] = document["_id"]
+    for field, spec in fields.items():
+        if isinstance(spec, (str, dict)):
+            value = _evaluate(document, spec)
+        else:
+            value = _get_value(document, field)
+        if value is not _MISSING:
+            _set_value(projected, field, copy.deepcopy(value))
+    return projected
+
+
+# Queries
+
+
+def _matches(document: Dict[str, Any], query: Optional[Dict[str, Any]], text_fields: Tuple[str, ...] = ()) -> bool:
+    """Evaluate a query filter against a document"""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(_matches(document, sub, text_fields) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(document, sub, text_fields) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(_matches(document, sub, text_fields) for sub in condition):
+                return False
+        elif key == "$text":
+            if not _text_matches(document, condition["$search"], text_fields):
+                return False
+        elif key == "$expr":
+            if not _evaluate(document, condition):
+                return False
+        elif key.startswith("$"):
+            raise OperationFailure(f"unknown top level operator: {key}")
+        elif not _field_matches(_lookup_values(document, key), condition):
+            return False
+    return True
+
+
+def _text_matches(document: Dict[str, Any], search: str, text_fields: Tuple[str, ...]) -> bool:
+    if not text_fields:
+        raise OperationFailure("text index required for $text query")
+    terms = {term.lower() for term in search.split()}
+    words = set()
+    for field in text_fields:
+        for value in _lookup_values(document, field):
+            if isinstance(value, str):
+                words.update(re.findall(r"\w+", value.lower()))
+    return bool(terms & words)
+
+
+def _is_operator_dict(condition: Any) -> bool:
+    return isinstance(condition, dict) and bool(condition) and all(key.startswith("$") for key in condition)
+
+
+def _equals(values: List[Any], expected: Any) -> bool:
+    if not values:
+        return expected is None
+    for value in values:
+        if value == expected and _type_rank(value) == _type_rank(expected):
+            return True
+        if isinstance(value, list) and not isinstance(expected, list) and expected in value:
+            return True
+    return False
+
+
+def _flatten(values: List[Any]) -> List[Any]:
+    flattened = []
+    for value in values:
+        if isinstance(value, list):
+            flattened.extend(value)
+        flattened.append(value)
+    return flattened
+
+
+def _field_matches(values: List[Any], condition: Any) -> bool:
+    if not _is_operator_dict(condition):
+        if isinstance(condition, re.Pattern):
+            return any(isinstance(value, str) and condition.search(value) for value in _flatten(values))
+        return _equals(values, condition)
+    
+    for operator, operand in condition.items():
+        if operator == "$eq":
+            matched = _equals(values, operand)
+        elif operator == "$ne":
+            matched = not _equals(values, operand)
+        elif operator == "$in":
+            matched = any(_field_matches(values, item) for item in operand)
+        elif operator == "$nin":
+            matched = not any(_field_matches(values, item) for item in operand)
+        elif operator in ("$gt", "$gte", "$lt", "$lte"):
+            results = [_compare(value, operand) for value in _flatten(values)]
+            checks = {
+                "$gt": lambda result: result > 0,
+                "$gte": lambda result: result >= 0,
+                "$lt": lambda result: result < 0,
+                "$lte": lambda result: result <= 0
+            }
+            matched = any(result is not None and checks[operator](result) for result in results)
+        elif operator == "$exists":
+            matched = bool(values) == bool(operand)
+        elif operator == "$regex":
+            flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+            pattern = operand if isinstance(operand, re.Pattern) else re.compile(operand, flags)
+            matched = any(isinstance(value, str) and pattern.search(value) for value in _flatten(values))
+        elif operator == "$options":
+            continue
+        elif operator == "$not":
+            matched = not _field_matches(values, operand)
+        elif operator == "$size":
+            matched = any(isinstance(value, list) and len(value) == operand for value in values)
+        elif operator == "$elemMatch":
+            matched = any(
+                isinstance(item, dict) and _matches(item, operand) if _has_field_keys(operand) else _field_matches([item], operand)
+                for value in values if isinstance(value, list) for item in value
+            )
+        else:
+            raise OperationFailure(f"unknown operator: {operator}")
+        if not matched:
+            return False
+    return True
+
+
+def _has_field_keys(condition: Dict[str, Any]) -> bool:
+    return any(not key.startswith("$") for key in condition)
+
+
+# Updates
+
+
+def _apply_update(document: Dict[str, Any], update: Dict[str, Any], inserting: bool = False) -> bool:
+    """Apply update operators in place; returns whether the document changed"""
+    before = copy.deepcopy(document)
+    
+    for operator, fields in update.items():
+        if operator == "$setOnInsert" and not inserting:
+            continue
+        for path, operand in fields.items():
+            current = _get_value(document, path)
+            if operator in ("$set", "$setOnInsert"):
+                _set_value(document, path, copy.deepcopy(operand))
+            elif operator == "$unset":
+                _unset_value(document, path)
+            elif operator == "$inc":
+                _set_value(document, path, (0 if current is _MISSING else current) + operand)
+            elif operator == "$mul":
+                _set_value(document, path, (0 if current is _MISSING else current) * operand)
+            elif operator == "$max":
+                if current is _MISSING or (_compare(operand, current) or 0) > 0:
+                    _set_value(document, path, operand)
+            elif operator == "$min":
+                if current is _MISSING or (_compare(operand, current) or 0) < 0:
+                    _set_value(document, path, operand)
+            elif operator in ("$push", "$addToSet"):
+                items = operand["$each"] if isinstance(operand, dict) and "$each" in operand else [operand]
+                array = [] if current is _MISSING else list(current)
+                for item in items:
+                    if operator == "$push" or item not in array:
+                        array.append(copy.deepcopy(item))
+                _set_value(document, path, array)
+            elif operator == "$pull":
+                if isinstance(current, list):
+                    _set_value(document, path, [item for item in current if not _field_matches([item], operand)])
+            elif operator == "$currentDate":
+                _set_value(document, path, datetime.utcnow())
+            else:
+                raise OperationFailure(f"Unknown modifier: {operator}")
+    
+    return document != before
+
+
+def _upsert_seed(query: Dict[str, Any]) -> Dict[str, Any]:
+    """Equality fields of a filter, which an upsert copies into the new document"""
+    seed: Dict[str, Any] = {}
+    for key, condition in query.items():
+        if key == "$and":
+            for sub in condition:
+                seed.update(_upsert_seed(sub))
+        elif not key.startswith("$"):
+            if _is_operator_dict(condition):
+                if "$eq" in condition:
+                    _set_value(seed, key, copy.deepcopy(condition["$eq"]))
+            else:
+                _set_value(seed, key, copy.deepcopy(condition))
+    return seed
+
+
+# Aggregation expressions
+
+
+def _evaluate(document: Dict[str, Any], expression: Any) -> Any:
+    """Evaluate an aggregation expression"""
+    if isinstance(expression, str) and expression.startswith("$$ROOT"):
+        return document
+    if isinstance(expression, str) and expression.startswith("$"):
+        return _get_value(document, expression[1:])
+    if isinstance(expression, list):
+        return [_evaluate(document, item) for item in expression]
+    if not isinstance(expression, dict):
+        return expression
+    if not _is_operator_dict(expression):
+        return {key: _evaluate(document, value) for key, value in expression.items()}
+    
+    operator, operand = next(iter(expression.items()))
+    args = [_evaluate(document, arg) for arg in operand] if isinstance(operand, list) else [_evaluate(document, operand)]
+    args = [None if arg is _MISSING else arg for arg in args]
+    
+    if operator == "$literal":
+        return operand
+    if operator in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+        result = _compare(args[0], args[1])
+        if operator == "$eq":
+            return args[0] == args[1]
+        if operator == "$ne":
+            return args[0] != args[1]
+        if result is None:
+            return _type_rank(args[0]) > _type_rank(args[1]) if operator in ("$gt", "$gte") else _type_rank(args[0]) < _type_rank(args[1])
+        return {"$gt": result > 0, "$gte": result >= 0, "$lt": result < 0, "$lte": result <= 0}[operator]
+    if operator == "$and":
+        return all(args)
+    if operator == "$or":
+        return any(args)
+    if operator == "$not":
+        return not args[0]
+    if operator == "$in":
+        return args[0] in (args[1] or [])
+    if operator == "$ifNull":
+        return next((arg for arg in args if arg is not None), None)
+    if operator == "$cond":
+        if isinstance(operand, dict):
+            branch = operand["then"] if _evaluate(document, operand["if"]) else operand["else"]
+            return _evaluate(document, branch)
+        return args[1] if args[0] else args[2]
+    if operator == "$size":
+        return len(args[0] or [])
+    if operator in ("$add", "$subtract", "$multiply", "$divide"):
+        result = args[0]
+        for arg in args[1:]:
+            result = {
+                "$add": lambda a, b: a + b,
+                "$subtract": lambda a, b: a - b,
+                "$multiply": lambda a, b: a * b,
+                "$divide": lambda a, b: a / b
+            }[operator](result, arg)
+        return result
+    if operator == "$toString":
+        return None if args[0] is None else str(args[0])
+    raise OperationFailure(f"Unsupported expression operator in memory backend: {operator}")
+
+
+class _Accumulator:
+    """One $group accumulator over a bucket of documents"""
+    
+    def __init__(self, operator: str, expression: Any):
+        self.operator = operator
+        self.expression = expression
+        self.values: List[Any] = []
+    
+    def add(self, document: Dict[str, Any]) -> None:
+        self.values.append(_evaluate(document, self.expression))
+    
+    def result(self) -> Any:
+        present = [value for value in self.values if value is not _MISSING]
+        numbers = [value for value in present if isinstance(value, (int, float)) and not isinstance(value, bool)]
+        if self.operator == "$sum":
+            return sum(numbers)
+        if self.operator == "$avg":
+            return sum(numbers) / len(numbers) if numbers else None
+        if self.operator in ("$max", "$min"):
+            candidates = [value for value in present if value is not None]
+            if not candidates:
+                return None
+            chooser = max if self.operator == "$max" else min
+            return chooser(candidates, key=_sort_key)
+        if self.operator == "$first":
+            return None if not self.values or self.values[0] is _MISSING else self.values[0]
+        if self.operator == "$last":
+            return None if not self.values or self.values[-1] is _MISSING else self.values[-1]
+        if self.operator == "$push":
+            return present
+        if self.operator == "$addToSet":
+            unique = []
+            for value in present:
+                if value not in unique:
+                    unique.append(value)
+            return unique
+        raise OperationFailure(f"Unsupported accumulator in memory backend: {self.operator}")
+
+
+# Cursors
+
+
+def _normalize_sort(key_or_list: Any, direction: Optional[int] = None) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else ASCENDING)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [tuple(item) for item in key_or_list]
+
+
+def _sorted(documents: List[Dict[str, Any]], sort: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    # Stable sorts applied from the least significant key
+    for field, direction in reversed(sort):
+        if isinstance(direction, dict):
+            continue  # {"$meta": "textScore"}
+        documents = sorted(
+            documents,
+            key=lambda document: _sort_key(_get_value(document, field)),
+            reverse=direction < 0
+        )
+    return documents
+
+
+class MemoryCursor:
+    """Lazily evaluated result of find() or aggregate()"""
+    
+    def __init__(self, producer):
+        self._producer = producer
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[Dict[str, Any]]] = None
+    
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> "MemoryCursor":
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+    
+    def skip(self, skip: int) -> "MemoryCursor":
+        self._skip = skip
+        return self
+    
+    def limit(self, limit: int) -> "MemoryCursor":
+        self._limit = limit
+        return self
+    
+    def batch_size(self, batch_size: int) -> "MemoryCursor":
+        return self
+    
+    def _evaluate(self) -> List[Dict[str, Any]]:
+        if self._results is None:
+            self._results = self._producer(self._sort, self._skip, self._limit)
+        return self._results
+    
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        results = self._evaluate()
+        return list(results if length is None else results[:length])
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        for document in self._evaluate():
+            yield document
+    
+    async def close(self) -> None:
+        self._results = []
+
+
+class MemorySession:
+    """No-op client session; single-process operations are already causally consistent"""
+    
+    def __init__(self, client: "MemoryClient"):
+        self.client = client
+    
+    async def __aenter__(self) -> "MemorySession":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+    
+    async def end_session(self) -> None:
+        return None
+
+
+class MemoryCollection:
+    """In-memory collection with the Motor collection API used by the application"""
+    
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._documents: Dict[Any, Dict[str, Any]] = {}
+        self._indexes: Dict[str, Dict[str, Any]] = {
+            "_id_": {"v": 2, "key": {"_id": 1}, "name": "_id_"}
+        }
+    
+    @property
+    def full_name(self) -> str:
+        return f"{self.database.name}.{self.name}"
+    
+    def with_options(self, **kwargs: Any) -> "MemoryCollection":
+        return self
+    
+    def _text_fields(self) -> Tuple[str, ...]:
+        for info in self._indexes.values():
+            if "weights" in info:
+                return tuple(info["weights"])
+        return ()
+    
+    def _select(self, query: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        text_fields = self._text_fields()
+        return [document for document in self._documents.values() if _matches(document, query, text_fields)]
+    
+    def _check_unique(self, document: Dict[str, Any]) -> None:
+        for info in self._indexes.values():
+            if not info.get("unique") or info["name"] == "_id_":
+                continue
+            fields = list(info["key"])
+            values = [_get_value(document, field) for field in fields]
+            if info.get("sparse") and all(value is _MISSING for value in values):
+                continue
+            for other in self._documents.values():
+                if other["_id"] != document["_id"] and [_get_value(other, field) for field in fields] == values:
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: {self.full_name} index: {info['name']}",
+                        11000
+                    )
+    
+    def _store(self, document: Dict[str, Any], replacing: bool = False) -> None:
+        if not replacing and document["_id"] in self._documents:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.full_name} index: _id_", 11000)
+        self._check_unique(document)
+        self._documents[document["_id"]] = document
+    
+    # Reads
+    
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Any = None, *args: Any, **kwargs: Any) -> MemoryCursor:
+        query = copy.deepcopy(filter or {})
+        
+        def produce(sort, skip, limit):
+            documents = _sorted(self._select(query), sort)
+            documents = documents[skip:skip + limit if limit else None]
+            return [_project(copy.deepcopy(document), projection) for document in documents]
+        
+        cursor = MemoryCursor(produce)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        cursor.skip(kwargs.get("skip", 0))
+        cursor.limit(kwargs.get("limit", 0))
+        return cursor
+    
+    async def find_one(self, filter: Any = None, projection: Any = None, *args: Any, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        results = await self.find(filter, projection, **kwargs).limit(1).to_list(1)
+        return results[0] if results else None
+    
+    async def count_documents(self, filter: Dict[str, Any], *args: Any, **kwargs: Any) -> int:
+        count = len(self._select(filter)) - kwargs.get("skip", 0)
+        count = max(count, 0)
+        return min(count, kwargs["limit"]) if kwargs.get("limit") else count
+    
+    async def estimated_document_count(self, **kwargs: Any) -> int:
+        return len(self._documents)
+    
+    async def distinct(self, key: str, filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Any]:
+        values: List[Any] = []
+        for document in self._select(filter):
+            for value in _flatten(_lookup_values(document, key)):
+                if not isinstance(value, list) and value not in values:
+                    values.append(value)
+        return values
+    
+    def aggregate(self, pipeline: List[Dict[str, Any]], *args: Any, **kwargs: Any) -> MemoryCursor:
+        pipeline = copy.deepcopy(pipeline)
+        
+        def produce(sort, skip, limit):
+            return self.database._run_pipeline(self, [copy.deepcopy(document) for document in self._documents.values()], pipeline)
+        
+        return MemoryCursor(produce)
+    
+    # Writes
+    
+    async def insert_one(self, document: Dict[str, Any], *args: Any, **kwargs: Any) -> InsertOneResult:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        self._store(copy.deepcopy(document))
+        return InsertOneResult(document["_id"], True)
+    
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True, **kwargs: Any) -> InsertManyResult:
+        inserted_ids = []
+        write_errors = []
+        for index, document in enumerate(documents):
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+            inserted_ids.append(document["_id"])
+            try:
+                self._store(copy.deepcopy(document))
+            except DuplicateKeyError as e:
+                write_errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+        if write_errors:
+            raise BulkWriteError({
+                "writeErrors": write_errors, "writeConcernErrors": [], "nInserted": len(inserted_ids) - len(write_errors),
+                "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []
+            })
+        return InsertManyResult(inserted_ids, True)
+    
+    def _update(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool, multi: bool) -> Dict[str, Any]:
+        matched = self._select(filter)
+        if not multi:
+            matched = matched[:1]
+        
+        if not matched:
+            if not upsert:
+                return {"n": 0, "nModified": 0}
+            document = _upsert_seed(filter)
+            _apply_update(document, update, inserting=True)
+            document.setdefault("_id", ObjectId())
+            self._store(document)
+            return {"n": 1, "nModified": 0, "upserted": document["_id"]}
+        
+        modified = 0
+        for document in matched:
+            updated = copy.deepcopy(document)
+            if _apply_update(updated, update):
+                self._store(updated, replacing=True)
+                modified += 1
+        return {"n": len(matched), "nModified": modified}
+    
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, **kwargs: Any) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, multi=False), True)
+    
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, **kwargs: Any) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, multi=True), True)
+    
+    async def replace_one(self, filter: Dict[str, Any], replacement: Dict[str, Any], upsert: bool = False, **kwargs: Any) -> UpdateResult:
+        return UpdateResult(self._replace(filter, replacement, upsert), True)
+    
+    def _replace(self, filter: Dict[str, Any], replacement: Dict[str, Any], upsert: bool) -> Dict[str, Any]:
+        matched = self._select(filter)[:1]
+        if not matched:
+            if not upsert:
+                return {"n": 0, "nModified": 0}
+            document = {**_upsert_seed(filter), **copy.deepcopy(replacement)}
+            document.setdefault("_id", ObjectId())
+            self._store(document)
+            return {"n": 1, "nModified": 0, "upserted": document["_id"]}
+        document = {**copy.deepcopy(replacement), "_id": matched[0]["_id"]}
+        self._store(document, replacing=True)
+        return {"n": 1, "nModified": int(document != matched[0])}
+    
+    def _delete(self, filter: Dict[str, Any], multi: bool) -> Dict[str, Any]:
+        matched = self._select(filter)
+        if not multi:
+            matched = matched[:1]
+        for document in matched:
+            del self._documents[document["_id"]]
+        return {"n": len(matched)}
+    
+    async def delete_one(self, filter: Dict[str, Any], **kwargs: Any) -> DeleteResult:
+        return DeleteResult(self._delete(filter, multi=False), True)
+    
+    async def delete_many(self, filter: Dict[str, Any], **kwargs: Any) -> DeleteResult:
+        return DeleteResult(self._delete(filter, multi=True), True)
+    
+    async def find_one_and_update(
+        self,
+        filter: Dict[str, Any],
+        update: Dict[str, Any],
+        projection: Any = None,
+        sort: Any = None,
+        upsert: bool = False,
+        return_document: bool = False,
+        **kwargs: Any
+    ) -> Optional[Dict[str, Any]]:
+        matched = _sorted(self._select(filter), _normalize_sort(sort) if sort else [])[:1]
+        if not matched:
+            if not upsert:
+                return None
+            result = self._update(filter, update, upsert=True, multi=False)
+            return _project(copy.deepcopy(self._documents[result["upserted"]]), projection) if return_document else None
+        
+        before = copy.deepcopy(matched[0])
+        self._update({"_id": before["_id"]}, update, upsert=False, multi=False)
+        document = self._documents[before["_id"]] if return_document else before
+        return _project(copy.deepcopy(document), projection)
+    
+    async def find_one_and_delete(self, filter: Dict[str, Any], projection: Any = None, sort: Any = None, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        matched = _sorted(self._select(filter), _normalize_sort(sort) if sort else [])[:1]
+        if not matched:
+            return None
+        del self._documents[matched[0]["_id"]]
+        return _project(matched[0], projection)
+    
+    async def bulk_write(self, requests: List[Any], ordered: bool = True, **kwargs: Any) -> BulkWriteResult:
+        result = {
+            "writeErrors": [], "writeConcernErrors": [], "nInserted": 0, "nUpserted": 0,
+            "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []
+        }
+        for position, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    await self.insert_one(request._doc)
+                    result["nInserted"] += 1
+                    continue
+                if isinstance(request, (UpdateOne, UpdateMany)):
+                    outcome = self._update(request._filter, request._doc, bool(request._upsert), multi=isinstance(request, UpdateMany))
+                elif isinstance(request, ReplaceOne):
+                    outcome = self._replace(request._filter, request._doc, bool(request._upsert))
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    result["nRemoved"] += self._delete(request._filter, multi=isinstance(request, DeleteMany))["n"]
+                    continue
+                else:
+                    raise TypeError(f"{request!r} is not a valid request")
+                
+                if "upserted" in outcome:
+                    result["nUpserted"] += 1
+                    result["upserted"].append({"index": position, "_id": outcome["upserted"]})
+                else:
+                    result["nMatched"] += outcome["n"]
+                    result["nModified"] += outcome["nModified"]
+            except DuplicateKeyError as e:
+                result["writeErrors"].append({"index": position, "code": 11000, "errmsg": str(e), "op": request})
+                if ordered:
+                    break
+        
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+    
+    # Indexes
+    
+    async def create_index(self, keys: Any, **kwargs: Any) -> str:
+        keys = _normalize_sort(keys)
+        name = kwargs.pop("name", None) or "_".join(f"{key}_{direction}" for key, direction in keys)
+        info: Dict[str, Any] = {"v": 2, "name": name, **kwargs}
+        if any(direction == TEXT for _, direction in keys):
+            info["key"] = {"_fts": "text", "_ftsx": 1}
+            info["weights"] = {key: 1 for key, direction in keys if direction == TEXT}
+        else:
+            info["key"] = dict(keys)
+        
+        existing = self._indexes.get(name)
+        if existing is not None and existing != info:
+            raise OperationFailure(f"An existing index has the same name as the requested index: {name}", 86)
+        if info.get("unique"):
+            for document in self._documents.values():
+                self._check_unique(document)
+        self._indexes[name] = info
+        return name
+    
+    def list_indexes(self, **kwargs: Any) -> MemoryCursor:
+        return MemoryCursor(lambda sort, skip, limit: copy.deepcopy(list(self._indexes.values())))
+    
+    async def index_information(self, **kwargs: Any) -> Dict[str, Dict[str, Any]]:
+        return {name: {"key": list(info["key"].items())} for name, info in self._indexes.items()}
+    
+    async def drop_index(self, index_or_name: Any, **kwargs: Any) -> None:
+        if index_or_name not in self._indexes or index_or_name == "_id_":
+            raise OperationFailure(f"index not found with name [{index_or_name}]", 27)
+        del self._indexes[index_or_name]
+    
+    async def drop(self, **kwargs: Any) -> None:
+        await self.database.drop_collection(self.name)
+
+
+class MemoryDatabase:
+    """In-memory database holding collections by name"""
+    
+    def __init__(self, client: "MemoryClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+    
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+    
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(self, name)
+        return self._collections[name]
+    
+    def get_collection(self, name: str, **kwargs: Any) -> MemoryCollection:
+        return self[name]
+    
+    def with_options(self, **kwargs: Any) -> "MemoryDatabase":
+        # Read preferences and concerns are meaningless with one in-process copy of the data
+        return self
+    
+    async def create_collection(self, name: str, **kwargs: Any) -> MemoryCollection:
+        if name in self._collections:
+            raise CollectionInvalid(f"collection {name} already exists")
+        return self[name]
+    
+    async def list_collection_names(self, **kwargs: Any) -> List[str]:
+        return list(self._collections)
+    
+    async def drop_collection(self, name: str, **kwargs: Any) -> None:
+        self._collections.pop(getattr(name, "name", name), None)
+    
+    async def command(self, command: Union[str, Dict[str, Any]], *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name == "ping":
+            return {"ok": 1.0}
+        if name in ("ismaster", "isMaster", "hello"):
+            return {"ismaster": True, "isWritablePrimary": True, "maxWireVersion": 21, "ok": 1.0}
+        raise OperationFailure(f"Command {name} is not supported by the memory backend", 59)
+    
+    def _run_pipeline(self, collection: MemoryCollection, documents: List[Dict[str, Any]], pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run aggregation stages over documents"""
+        for position, stage in enumerate(pipeline):
+            operator, spec = next(iter(stage.items()))
+            if operator == "$match":
+                # Only a leading $match can use the collection's text index
+                text_fields = collection._text_fields() if position == 0 else ()
+                documents = [document for document in documents if _matches(document, spec, text_fields)]
+            elif operator == "$sort":
+                documents = _sorted(documents, _normalize_sort(spec))
+            elif operator == "$skip":
+                documents = documents[spec:]
+            elif operator == "$limit":
+                documents = documents[:spec]
+            elif operator == "$project":
+                documents = [_project(document, spec) for document in documents]
+            elif operator == "$unset":
+                fields = [spec] if isinstance(spec, str) else spec
+                documents = [_project(document, {field: 0 for field in fields}) for document in documents]
+            elif operator in ("$addFields", "$set"):
+                for document in documents:
+                    for field, expression in spec.items():
+                        _set_value(document, field, _evaluate(document, expression))
+            elif operator == "$unwind":
+                documents = self._unwind(documents, spec)
+            elif operator == "$lookup":
+                documents = self._lookup(documents, spec)
+            elif operator == "$group":
+                documents = self._group(documents, spec)
+            elif operator == "$count":
+                documents = [{spec: len(documents)}] if documents else []
+            elif operator == "$sortByCount":
+                documents = self._run_pipeline(collection, documents, [
+                    {"$group": {"_id": spec, "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}}
+                ])
+            else:
+                raise OperationFailure(f"Unsupported pipeline stage in memory backend: {operator}")
+        return documents
+    
+    def _unwind(self, documents: List[Dict[str, Any]], spec: Union[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if isinstance(spec, str):
+            spec = {"path": spec}
+        path = spec["path"][1:]
+        preserve = spec.get("preserveNullAndEmptyArrays", False)
+        unwound = []
+        for document in documents:
+            value = _get_value(document, path)
+            if isinstance(value, list) and value:
+                for item in value:
+                    copied = copy.deepcopy(document)
+                    _set_value(copied, path, item)
+                    unwound.append(copied)
+            elif isinstance(value, list) or value is _MISSING or value is None:
+                if preserve:
+                    copied = copy.deepcopy(document)
+                    if isinstance(value, list):
+                        _unset_value(copied, path)
+                    unwound.append(copied)
+            else:
+                unwound.append(document)
+        return unwound
+    
+    def _lookup(self, documents: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+        foreign = self[spec["from"]]
+        sub_pipeline = spec.get("pipeline", [])
+        for document in documents:
+            if "localField" in spec:
+                local_values = _lookup_values(document, spec["localField"])
+                local_values = _flatten(local_values) or [None]
+                joined = [
+                    copy.deepcopy(candidate) for candidate in foreign._documents.values()
+                    if any(_equals(_lookup_values(candidate, spec["foreignField"]), value) for value in local_values)
+                ]
+            else:
+                joined = [copy.deepcopy(candidate) for candidate in foreign._documents.values()]
+            if sub_pipeline:
+                if spec.get("let"):
+                    raise OperationFailure("$lookup with let is not supported by the memory backend")
+                joined = self._run_pipeline(foreign, joined, sub_pipeline)
+            document[spec["as"]] = joined
+        return documents
+    
+    def _group(self, documents: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+        groups: Dict[str, Dict[str, Any]] = {}
+        for document in documents:
+            key = _evaluate(document, spec["_id"])
+            key = None if key is _MISSING else key
+            bucket = groups.get(repr(key))
+            if bucket is None:
+                bucket = groups[repr(key)] = {
+                    "_id": key,
+                    "accumulators": {
+                        field: _Accumulator(*next(iter(accumulator.items())))
+                        for field, accumulator in spec.items() if field != "_id"
+                    }
+                }
+            for accumulator in bucket["accumulators"].values():
+                accumulator.add(document)
+        
+        return [
+            {"_id": bucket["_id"], **{field: accumulator.result() for field, accumulator in bucket["accumulators"].items()}}
+            for bucket in groups.values()
+        ]
+
+
+class MemoryClient:
+    """In-process stand-in for AsyncIOMotorClient"""
+    
+    def __init__(self, *args: Any, **kwargs: Any):
+        self._databases: Dict[str, MemoryDatabase] = {}
+    
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(self, name)
+        return self._databases[name]
+    
+    def __getattr__(self, name: str) -> MemoryDatabase:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+    
+    def get_database(self, name: str, **kwargs: Any) -> MemoryDatabase:
+        return self[name]
+    
+    async def list_database_names(self, **kwargs: Any) -> List[str]:
+        return list(self._databases)
+    
+    async def drop_database(self, name_or_database: Any, **kwargs: Any) -> None:
+        self._databases.pop(getattr(name_or_database, "name", name_or_database), None)
+    
+    async def start_session(self, **kwargs: Any) -> MemorySession:
+        return MemorySession(self)
+    
+    def close(self) -> None:
+        return None
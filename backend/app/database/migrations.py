@@ -0,0 +1,172 @@
+"""
+Versioned data migrations
+Each migration walks its collection in _id order, writes changes with bulk_write, checkpoints
+after every batch so an interrupted run resumes, and throttles itself to a target ops/sec
+"""
+
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+
+from app.models.notification import NotificationType, normalize_notification_types
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "migrations"
+
+
+class Migration(ABC):
+    """One versioned data migration over a single collection"""
+    version: int
+    name: str
+    collection: str
+    # Documents that may need changes; the runner adds the _id checkpoint
+    query: Dict[str, Any] = {}
+    projection: Optional[Dict[str, Any]] = None
+    
+    @abstractmethod
+    def update_for(self, document: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the update for a document, or None to leave it unchanged"""
+
+
+class NormalizeNotificationTypes(Migration):
+    """Map legacy notification_type values to the enum and fill in the frontend type"""
+    version = 1
+    name = "normalize_notification_types"
+    collection = "notifications"
+    query = {
+        "$or": [
+            {"notification_type": {"$nin": [t.value for t in NotificationType]}},
+            {"type": {"$exists": False}},
+            {"type": {"$in": ["", None]}}
+        ]
+    }
+    projection = {"notification_type": 1, "type": 1}
+    
+    def update_for(self, document: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        changes = {
+            field: value
+            for field, value in normalize_notification_types(document).items()
+            if value != document.get(field)
+        }
+        if not changes:
+            return None
+        changes["updated_at"] = datetime.utcnow()
+        return {"$set": changes}
+
+
+# All migrations in version order
+MIGRATIONS: List[Migration] = [
+    NormalizeNotificationTypes(),
+]
+
+
+class MigrationRunner:
+    """Apply pending migrations in batches with checkpoints and an ops/sec ceiling"""
+    
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        batch_size: int = 500,
+        target_ops_per_second: Optional[float] = None,
+        migrations: List[Migration] = MIGRATIONS
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.target_ops_per_second = target_ops_per_second
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+    
+    async def records(self) -> Dict[int, Dict[str, Any]]:
+        """Recorded state of every migration that has started, by version"""
+        return {
+            record["_id"]: record
+            async for record in self.db[MIGRATIONS_COLLECTION].find({})
+        }
+    
+    async def pending(self) -> List[Migration]:
+        """Migrations not yet applied, including interrupted ones"""
+        records = await self.records()
+        return [
+            migration for migration in self.migrations
+            if records.get(migration.version, {}).get("state") != "applied"
+        ]
+    
+    async def run_pending(self, on_progress: Optional[Callable[[Migration, Dict[str, Any]], None]] = None) -> List[Migration]:
+        """Apply every pending migration in version order"""
+        pending = await self.pending()
+        for migration in pending:
+            await self.run(migration, on_progress)
+        return pending
+    
+    async def run(self, migration: Migration, on_progress: Optional[Callable[[Migration, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Apply one migration, resuming from its last checkpoint"""
+        migrations = self.db[MIGRATIONS_COLLECTION]
+        record = await migrations.find_one_and_update(
+            {"_id": migration.version},
+            {
+                "$set": {"name": migration.name, "state": "running", "updated_at": datetime.utcnow()},
+                "$setOnInsert": {"last_id": None, "processed": 0, "modified": 0, "started_at": datetime.utcnow()}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if record["last_id"] is not None:
+            logger.info(f"Resuming migration {migration.version} ({migration.name}) after _id {record['last_id']}")
+        
+        collection = self.db[migration.collection]
+        last_id = record["last_id"]
+        processed = record["processed"]
+        modified = record["modified"]
+        started = time.monotonic()
+        operations_sent = 0
+        
+        while True:
+            query = migration.query
+            if last_id is not None:
+                query = {"$and": [migration.query, {"_id": {"$gt": last_id}}]} if migration.query else {"_id": {"$gt": last_id}}
+            
+            batch = await collection.find(query, migration.projection).sort("_id", 1).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+            
+            operations = []
+            for document in batch:
+                update = migration.update_for(document)
+                if update:
+                    operations.append(UpdateOne({"_id": document["_id"]}, update))
+            
+            if operations:
+                result = await collection.bulk_write(operations, ordered=False)
+                modified += result.modified_count
+            
+            last_id = batch[-1]["_id"]
+            processed += len(batch)
+            operations_sent += len(operations)
+            record = await migrations.find_one_and_update(
+                {"_id": migration.version},
+                {"$set": {"last_id": last_id, "processed": processed, "modified": modified, "updated_at": datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER
+            )
+            if on_progress is not None:
+                on_progress(migration, record)
+            
+            await self._throttle(started, operations_sent)
+        
+        return await migrations.find_one_and_update(
+            {"_id": migration.version},
+            {"$set": {"state": "applied", "applied_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def _throttle(self, started: float, operations_sent: int) -> None:
+        """Sleep until the run's average rate is back under the target"""
+        if not self.target_ops_per_second:
+            return
+        ahead = operations_sent / self.target_ops_per_second - (time.monotonic() - started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
@@ -0,0 +1,271 @@
+"""
+MongoDB command monitoring
+Attributes command count and duration to the current HTTP request and keeps per-route histograms
+"""
+
+import bisect
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import monitoring
+
+from app.config import settings
+
+# Histogram bucket upper bounds; the last bucket collects everything above
+DB_TIME_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+COMMAND_COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32)
+
+
+class RequestDbStats:
+    """Command count and database time for one request"""
+    
+    def __init__(self, scope: Optional[Dict[str, Any]] = None):
+        self.scope = scope
+        self.commands = 0
+        self.duration_ms = 0.0
+        # Listener callbacks run on Motor's executor threads
+        self._lock = threading.Lock()
+    
+    def add(self, duration_micros: int) -> None:
+        with self._lock:
+            self.commands += 1
+            self.duration_ms += duration_micros / 1000
+    
+    @property
+    def route(self) -> Optional[str]:
+        return route_name(self.scope) if self.scope is not None else None
+
+
+# Motor copies the context into its executor threads, so the listener sees the request's stats
+_request_db_stats: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+
+def current_request_db_stats() -> Optional[RequestDbStats]:
+    """Get the database stats of the request being handled, if any"""
+    return _request_db_stats.get()
+
+
+class CommandTimingListener(monitoring.CommandListener):
+    """Add every completed command to the current request's stats"""
+    
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+    
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats.add(event.duration_micros)
+    
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        stats = _request_db_stats.get()
+        if stats is not None:
+            stats.add(event.duration_micros)
+
+
+class Histogram:
+    """Fixed-bucket histogram"""
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.max = max(self.max, value)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{bound}" for bound in self.bounds] + ["inf"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "total": round(self.total, 3),
+            "max": round(self.max, 3)
+        }
+
+
+class RouteDbStats:
+    """Per-route histograms of command count and database time"""
+    
+    def __init__(self):
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, route: str, stats: RequestDbStats) -> None:
+        with self._lock:
+            entry = self._routes.get(route)
+            if entry is None:
+                entry = self._routes[route] = {
+                    "requests": 0,
+                    "commands": Histogram(COMMAND_COUNT_BUCKETS),
+                    "db_time_ms": Histogram(DB_TIME_BUCKETS_MS)
+                }
+            entry["requests"] += 1
+            entry["commands"].observe(stats.commands)
+            entry["db_time_ms"].observe(stats.duration_ms)
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get per-route histograms, busiest routes by total database time first"""
+        with self._lock:
+            routes = sorted(self._routes.items(), key=lambda item: item[1]["db_time_ms"].total, reverse=True)
+            return {
+                route: {
+                    "requests": entry["requests"],
+                    "avg_commands": round(entry["commands"].total / entry["requests"], 2),
+                    "avg_db_time_ms": round(entry["db_time_ms"].total / entry["requests"], 3),
+                    "commands": entry["commands"].to_dict(),
+                    "db_time_ms": entry["db_time_ms"].to_dict()
+                }
+                for route, entry in routes
+            }
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Track connection pool usage, checkout wait times and pool-cleared events"""
+    
+    def __init__(self, max_pool_size: int, max_samples: int = 1000):
+        self.max_pool_size = max_pool_size
+        self.open_connections = 0
+        self.checked_out = 0
+        self.max_checked_out = 0
+        # maxPoolSize applies per server, so saturation is tracked per address
+        self._checked_out_by_address: Dict[Any, int] = {}
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.pool_cleared = 0
+        self.last_cleared_at: Optional[datetime] = None
+        self._wait_ms: deque = deque(maxlen=max_samples)
+        # Checkout start and finish events fire on the same thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+    
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+    
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+    
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        with self._lock:
+            self.pool_cleared += 1
+            self.last_cleared_at = datetime.utcnow()
+    
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+    
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        with self._lock:
+            self.open_connections += 1
+    
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+    
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        with self._lock:
+            self.open_connections -= 1
+    
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        self._local.started = time.perf_counter()
+    
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+    
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        started = getattr(self._local, "started", None)
+        with self._lock:
+            self.checked_out += 1
+            self._checked_out_by_address[event.address] = self._checked_out_by_address.get(event.address, 0) + 1
+            self.checkouts += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+            if started is not None:
+                self._wait_ms.append((time.perf_counter() - started) * 1000)
+    
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        with self._lock:
+            self.checked_out -= 1
+            self._checked_out_by_address[event.address] = self._checked_out_by_address.get(event.address, 1) - 1
+    
+    @property
+    def saturation(self) -> float:
+        """Checked-out share of the busiest server's pool"""
+        if not self.max_pool_size or not self._checked_out_by_address:
+            return 0.0
+        return max(self._checked_out_by_address.values()) / self.max_pool_size
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get pool counters and checkout wait percentiles"""
+        with self._lock:
+            waits = sorted(self._wait_ms)
+        
+        def percentile(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))], 3) if waits else 0.0
+        
+        return {
+            "max_pool_size": self.max_pool_size,
+            "open_connections": self.open_connections,
+            "checked_out": self.checked_out,
+            "max_checked_out": self.max_checked_out,
+            "saturation": round(self.saturation, 4),
+            "checkouts": self.checkouts,
+            "checkout_failures": dict(self.checkout_failures),
+            "wait_ms_p50": percentile(0.5),
+            "wait_ms_p95": percentile(0.95),
+            "wait_ms_max": round(waits[-1], 3) if waits else 0.0,
+            "pool_cleared": self.pool_cleared,
+            "last_cleared_at": self.last_cleared_at.isoformat() if self.last_cleared_at else None
+        }
+
+
+def route_name(scope: Dict[str, Any]) -> str:
+    """Name a request by method and endpoint function, e.g. 'GET get_ticket_stats'"""
+    endpoint = scope.get("endpoint")
+    name = getattr(endpoint, "__name__", None) or "unmatched"
+    return f"{scope.get('method', '')} {name}"
+
+
+class DbTimingMiddleware:
+    """ASGI middleware adding a Server-Timing header with the request's database time"""
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        stats = RequestDbStats(scope)
+        token = _request_db_stats.set(stats)
+        started = time.perf_counter()
+        
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                total_ms = (time.perf_counter() - started) * 1000
+                headers: List[Tuple[bytes, bytes]] = list(message.get("headers", []))
+                headers.append((
+                    b"server-timing",
+                    f'db;dur={stats.duration_ms:.1f};desc="{stats.commands} commands", app;dur={total_ms:.1f}'.encode()
+                ))
+                message = {**message, "headers": headers}
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_db_stats.reset(token)
+            route_db_stats.record(route_name(scope), stats)
+
+
+# Create global listener and route stats instances
+command_timing_listener = CommandTimingListener()
+route_db_stats = RouteDbStats()
+pool_monitor = PoolMonitor(max_pool_size=settings.mongo_max_pool_size)
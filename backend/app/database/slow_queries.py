@@ -0,0 +1,283 @@
+"""
+Slow query log
+Slow find/aggregate commands are written to a capped collection with their query shape
+and route; an executionStats explain is captured in the background at most once per shape
+per interval, since explaining re-runs the query
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import monitoring
+from pymongo.errors import CollectionInvalid
+
+from app.config import settings
+from app.database.monitoring import current_request_db_stats
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES_COLLECTION = "slow_queries"
+MONITORED_COMMANDS = ("find", "aggregate")
+# Driver-added fields that are not part of the query itself
+DRIVER_FIELDS = ("lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern")
+# Explain output that is identical for every record
+EXPLAIN_NOISE = ("serverInfo", "serverParameters", "command", "$clusterTime", "operationTime", "ok")
+# Shapes whose last explain time is remembered before expired ones are pruned
+MAX_EXPLAINED_SHAPES = 10000
+
+
+def query_shape(value: Any) -> Any:
+    """Replace literal values with '?' keeping field names, operators and $field references"""
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        # $in lists of any length share one shape
+        return shapes[:1] if shapes and all(shape == "?" for shape in shapes) else shapes
+    return "?"
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalized shape of a find or aggregate command"""
+    if command_name == "find":
+        return {
+            "filter": query_shape(command.get("filter", {})),
+            # Sort and projection are structural, keep them as written
+            "sort": dict(command.get("sort") or {}),
+            "projection": dict(command.get("projection") or {})
+        }
+    return {"pipeline": [query_shape(stage) for stage in command.get("pipeline", [])]}
+
+
+def fingerprint(command_name: str, collection: str, shape: Dict[str, Any]) -> str:
+    """Stable identifier for all commands with the same shape"""
+    payload = json.dumps([command_name, collection, shape], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """Command listener that queues slow commands and a worker that explains and stores them"""
+    
+    def __init__(
+        self,
+        threshold_ms: Optional[float],
+        capped_size_bytes: int,
+        explain: bool,
+        explain_interval_seconds: float,
+        max_queue_size: int = 1000
+    ):
+        self.threshold_ms = threshold_ms
+        self.capped_size_bytes = capped_size_bytes
+        self.explain = explain
+        self.explain_interval_seconds = explain_interval_seconds
+        self.max_queue_size = max_queue_size
+        # fingerprint -> monotonic time of its last explain
+        self._explained_at: Dict[str, float] = {}
+        # (connection id, request id) -> (command, route) for commands in flight
+        self._in_flight: Dict[Tuple[Any, int], Tuple[Dict[str, Any], Optional[str]]] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[AsyncIOMotorDatabase] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.recorded = 0
+        self.dropped = 0
+        self.explained = 0
+        self.explains_skipped = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms is not None
+    
+    # Listener callbacks run on driver threads and must stay cheap
+    
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if self._queue is None or event.command_name not in MONITORED_COMMANDS:
+            return
+        stats = current_request_db_stats()
+        with self._lock:
+            self._in_flight[(event.connection_id, event.request_id)] = (event.command, stats.route if stats else None)
+    
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finished(event)
+    
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finished(event)
+    
+    def _finished(self, event) -> None:
+        if event.command_name not in MONITORED_COMMANDS:
+            return
+        with self._lock:
+            entry = self._in_flight.pop((event.connection_id, event.request_id), None)
+        if entry is None:
+            return
+        
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < self.threshold_ms:
+            return
+        
+        command, route = entry
+        item = (event.command_name, event.database_name, command, route, duration_ms, datetime.utcnow())
+        try:
+            self._loop.call_soon_threadsafe(self._enqueue, item)
+        except RuntimeError:
+            # Loop already closed during shutdown
+            pass
+    
+    def _enqueue(self, item: tuple) -> None:
+        if self._queue is None:
+            return
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.dropped += 1
+    
+    async def start(self, db: AsyncIOMotorDatabase) -> None:
+        """Create the capped collection and start the background writer"""
+        if not self.enabled or self._task is not None:
+            return
+        
+        self._db = db
+        try:
+            await db.create_collection(SLOW_QUERIES_COLLECTION, capped=True, size=self.capped_size_bytes)
+        except CollectionInvalid:
+            pass  # Already exists
+        
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the background writer, discarding anything still queued"""
+        queue, self._queue = self._queue, None
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if queue is not None:
+            self.dropped += queue.qsize()
+        with self._lock:
+            self._in_flight.clear()
+    
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._record(*item)
+            except Exception as e:
+                logger.warning(f"Error recording slow query: {e}")
+    
+    async def _record(self, command_name: str, database_name: str, command: Dict[str, Any], route: Optional[str], duration_ms: float, created_at: datetime) -> None:
+        db = self._db
+        collection = command.get(command_name)
+        shape = command_shape(command_name, command)
+        shape_fingerprint = fingerprint(command_name, collection, shape)
+        
+        explain = None
+        if self.explain and self._should_explain(shape_fingerprint):
+            self.explained += 1
+            explainable = {key: value for key, value in command.items() if key not in DRIVER_FIELDS}
+            try:
+                result = await db.client[database_name].command(
+                    {"explain": explainable, "verbosity": "executionStats"}
+                )
+                explain = {key: value for key, value in result.items() if key not in EXPLAIN_NOISE}
+            except Exception as e:
+                explain = {"error": str(e)}
+        
+        await db[SLOW_QUERIES_COLLECTION].insert_one({
+            "fingerprint": shape_fingerprint,
+            "command": command_name,
+            "collection": collection,
+            "database": database_name,
+            "shape": shape,
+            "route": route,
+            "duration_ms": round(duration_ms, 3),
+            "explain": explain,
+            "created_at": created_at
+        })
+        self.recorded += 1
+    
+    def _should_explain(self, shape_fingerprint: str) -> bool:
+        """Allow one explain per shape per interval; later hits are recorded without one"""
+        now = time.monotonic()
+        last = self._explained_at.get(shape_fingerprint)
+        if last is not None and now - last < self.explain_interval_seconds:
+            self.explains_skipped += 1
+            return False
+        if len(self._explained_at) >= MAX_EXPLAINED_SHAPES:
+            cutoff = now - self.explain_interval_seconds
+            self._explained_at = {key: at for key, at in self._explained_at.items() if at > cutoff}
+        self._explained_at[shape_fingerprint] = now
+        return True
+    
+    async def slowest_shapes(self, limit: int = 20, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Group recorded slow queries by fingerprint, slowest first"""
+        if self._db is None:
+            return []
+        db = self._db
+        match = {"created_at": {"$gte": since}} if since else {}
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"duration_ms": -1}},
+            {"$group": {
+                "_id": "$fingerprint",
+                "command": {"$first": "$command"},
+                "collection": {"$first": "$collection"},
+                "shape": {"$first": "$shape"},
+                "count": {"$sum": 1},
+                "max_duration_ms": {"$max": "$duration_ms"},
+                "avg_duration_ms": {"$avg": "$duration_ms"},
+                "total_duration_ms": {"$sum": "$duration_ms"},
+                "routes": {"$addToSet": "$route"},
+                "last_seen": {"$max": "$created_at"},
+                "slowest_explain": {"$first": "$explain"}
+            }},
+            {"$sort": {"max_duration_ms": -1}},
+            {"$limit": limit}
+        ]
+        shapes = await db[SLOW_QUERIES_COLLECTION].aggregate(pipeline).to_list(limit)
+        for shape in shapes:
+            shape["fingerprint"] = shape.pop("_id")
+            shape["avg_duration_ms"] = round(shape["avg_duration_ms"], 3)
+            shape["routes"] = sorted(route for route in shape["routes"] if route)
+            if shape["slowest_explain"] is None:
+                # The slowest hit was only counted; use the slowest one that was explained
+                explained = await db[SLOW_QUERIES_COLLECTION].find_one(
+                    {"fingerprint": shape["fingerprint"], "explain": {"$ne": None}},
+                    {"explain": 1},
+                    sort=[("duration_ms", -1)]
+                )
+                shape["slowest_explain"] = explained["explain"] if explained else None
+        return shapes
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get log counters"""
+        return {
+            "threshold_ms": self.threshold_ms,
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "explained": self.explained,
+            "explains_skipped": self.explains_skipped,
+            "queued": self._queue.qsize() if self._queue is not None else 0
+        }
+
+
+# Create global slow query log
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.slow_query_threshold_ms,
+    capped_size_bytes=settings.slow_query_log_size_bytes,
+    explain=settings.slow_query_explain,
+    explain_interval_seconds=settings.slow_query_explain_interval_seconds
+)
@@ -0,0 +1,37 @@
+"""
+API key Pydantic models for service integrations
+"""
+
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict
+from bson import ObjectId
+
+from app.models.user import PyObjectId
+
+
+class ApiKeyCreate(BaseModel):
+    """API key creation model"""
+    name: str = Field(..., min_length=3, max_length=100)
+    user_id: PyObjectId = Field(..., description="Service account whose role the key acts with")
+
+
+class ApiKeyResponse(BaseModel):
+    """API key response model (never includes the secret)"""
+    model_config = ConfigDict(
+        populate_by_name=True,
+        json_encoders={ObjectId: str}
+    )
+    
+    id: PyObjectId = Field(alias="_id")
+    name: str
+    user_id: PyObjectId
+    key_prefix: str
+    created_by: PyObjectId
+    created_at: datetime
+    revoked_at: Optional[datetime] = None
+
+
+class ApiKeyCreated(ApiKeyResponse):
+    """API key creation response; the plaintext key is only returned once"""
+    key: str
@@ -22,6 +22,39 @@ class NotificationType(str, Enum):
     REMINDER = "reminder"
 
 
+# Legacy/mock notification_type values and the enum values they migrate to
+LEGACY_NOTIFICATION_TYPES: Dict[str, str] = {
+    "assignment": "ticket_assigned",
+    "urgent": "system_alert",
+    "new_ticket": "ticket_created",
+    "ticket_update": "ticket_status_changed"
+}
+
+# Frontend-friendly type stored alongside notification_type for icons
+FRONTEND_NOTIFICATION_TYPES: Dict[str, str] = {
+    "ticket_created": "new_ticket",
+    "ticket_assigned": "assignment",
+    "ticket_status_changed": "ticket_update",
+    "new_message": "message",
+    "ticket_resolved": "ticket_resolved",
+    "system_alert": "urgent",
+    "reminder": "reminder"
+}
+
+
+def normalize_notification_types(notification: Dict[str, Any]) -> Dict[str, str]:
+    """Get a notification's notification_type mapped to the enum and its frontend type filled in"""
+    notification_type = notification.get("notification_type")
+    if notification_type not in {t.value for t in NotificationType}:
+        notification_type = LEGACY_NOTIFICATION_TYPES.get(notification_type, NotificationType.SYSTEM_ALERT.value)
+    
+    type_field = notification.get("type")
+    if notification_type != notification.get("notification_type") or not type_field:
+        # The frontend type follows a corrected notification_type
+        type_field = FRONTEND_NOTIFICATION_TYPES.get(notification_type, "system")
+    return {"notification_type": notification_type, "type": type_field}
+
+
 class NotificationPriority(str, Enum):
     """Notification priority enumeration"""
     LOW = "low"
@@ -0,0 +1,39 @@
+"""
+Named MongoDB projections derived from the response models
+Queries that only build a response model load just that model's fields
+"""
+
+from typing import Dict, Type
+from pydantic import BaseModel
+
+from app.models.user import UserProfile, UserResponse
+from app.models.ticket import TicketSummary
+
+
+def projection_for(model: Type[BaseModel], *extra_fields: str) -> Dict[str, int]:
+    """Inclusion projection of a model's stored field names plus any extra fields"""
+    fields = [field.alias or name for name, field in model.model_fields.items()]
+    return {field: 1 for field in [*fields, *extra_fields]}
+
+
+def user_lookup(local_field: str, as_field: str, projection: Dict[str, int]) -> dict:
+    """$lookup into users that returns only the projected fields"""
+    return {
+        "$lookup": {
+            "from": "users",
+            "localField": local_field,
+            "foreignField": "_id",
+            "pipeline": [{"$project": projection}],
+            "as": as_field
+        }
+    }
+
+
+# Users: never load password_hash unless authenticating
+USER_PROFILE_PROJECTION = projection_for(UserProfile)
+USER_RESPONSE_PROJECTION = projection_for(UserResponse)
+# Profile plus email for notification payloads
+USER_CONTACT_PROJECTION = projection_for(UserProfile, "email")
+
+# Tickets: listing fields; created_by/assigned_to hold the ids the user loader resolves
+TICKET_SUMMARY_PROJECTION = projection_for(TicketSummary)
@@ -109,6 +109,8 @@ class TicketResponse(BaseModel):
     message_count: int = 0
     attachments: List[Attachment] = []
     tags: List[str] = []
+    # Incremented by every edit; tickets created before versioning read as 0
+    version: int = 0
     
     class Config:
         populate_by_name = True
@@ -127,6 +129,7 @@ class TicketSummary(BaseModel):
     created_at: datetime
     updated_at: datetime
     message_count: int = 0
+    version: int = 0
     
     class Config:
         populate_by_name = True
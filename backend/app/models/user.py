@@ -164,4 +164,14 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     """Token data model"""
     user_id: Optional[str] = None
-    email: Optional[str] = None 
\ No newline at end of file
+    email: Optional[str] = None
+
+
+class AuthPrincipal(BaseModel):
+    """Minimal identity used by endpoints that only authorize on role and status"""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    id: PyObjectId
+    email: Optional[str] = None
+    role: UserRole
+    status: UserStatus
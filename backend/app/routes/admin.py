@@ -2,21 +2,64 @@
 Admin routes for system management and user administration
 """
 
+import asyncio
 import math
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Optional
 from fastapi import APIRouter, HTTPException, status, Depends, Query
 from bson import ObjectId
 
-from app.database.connection import get_database
-from app.models.user import UserResponse, UserUpdate, UserRole, UserStatus, UserProfile
+from app.database.connection import get_database, get_analytics_database
+from app.database.change_streams import change_stream
+from app.database.counters import counter_buffer
+from app.database.inserts import insert_batcher
+from app.database.leases import lease_manager
+from app.database.loaders import get_loaders, ticket_cache, ticket_written
+from app.database.monitoring import route_db_stats, pool_monitor
+from app.database.slow_queries import slow_query_log
+from app.models.user import UserResponse, UserUpdate, UserRole, UserStatus, UserProfile, AuthPrincipal
 from app.models.ticket import TicketStats, TicketSummary, PaginatedTickets, TicketStatus, TicketResponse, TicketCreate
-from app.utils.auth import get_admin_user
+from app.models.projections import USER_PROFILE_PROJECTION, USER_RESPONSE_PROJECTION, TICKET_SUMMARY_PROJECTION
+from app.utils.auth import (
+    get_admin_user, get_admin_principal, invalidate_user_cache, revoke_user_tokens,
+    user_cache, token_cache, password_hashing_pool
+)
 from app.services.notification_service import notification_service
+from app.services.activity_service import last_login_tracker
+from app.utils.login_throttle import login_throttle
+from app.utils.api_keys import api_key_index, api_key_prefix, generate_api_key, hash_api_key
+from app.models.api_key import ApiKeyCreate, ApiKeyResponse, ApiKeyCreated
 
 router = APIRouter()
 
 
+def build_user_list_query(role: Optional[str] = None, status: Optional[str] = None, search: Optional[str] = None) -> dict:
+    """Build the admin user listing filter"""
+    query = {}
+    if role:
+        query["role"] = role
+    if status:
+        query["status"] = status
+    if search:
+        query["$or"] = [
+            {"full_name": {"$regex": search, "$options": "i"}},
+            {"email": {"$regex": search, "$options": "i"}},
+            {"username": {"$regex": search, "$options": "i"}}
+        ]
+    return query
+
+
+def build_user_page(query: dict, skip: int, limit: int) -> dict:
+    """Build the find arguments for a page of the admin user listing, newest first"""
+    return {
+        "filter": query,
+        "projection": USER_RESPONSE_PROJECTION,
+        "sort": [("created_at", -1)],
+        "skip": skip,
+        "limit": limit
+    }
+
+
 @router.get("/users", response_model=List[UserResponse])
 async def get_all_users(
     page: int = Query(1, ge=1),
@@ -24,29 +67,19 @@ async def get_all_users(
     role: Optional[str] = None,
     status: Optional[str] = None,
     search: Optional[str] = None,
-    current_user: UserResponse = Depends(get_admin_user)
+    current_user: AuthPrincipal = Depends(get_admin_principal)
 ):
     """Get all users with filtering and pagination (admin only)"""
     db = get_database()
     
     # Build query
-    query = {}
-    if role:
-        query["role"] = role
-    if status:
-        query["status"] = status
-    if search:
-        query["$or"] = [
-            {"full_name": {"$regex": search, "$options": "i"}},
-            {"email": {"$regex": search, "$options": "i"}},
-            {"username": {"$regex": search, "$options": "i"}}
-        ]
+    query = build_user_list_query(role, status, search)
     
     # Calculate pagination
     skip = (page - 1) * per_page
     
     # Get users
-    users_cursor = db.users.find(query).sort("created_at", -1).skip(skip).limit(per_page)
+    users_cursor = db.users.find(**build_user_page(query, skip, per_page))
     
     users = []
     async for user in users_cursor:
@@ -58,7 +91,7 @@ async def get_all_users(
 @router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user_by_id(
     user_id: str,
-    current_user: UserResponse = Depends(get_admin_user)
+    current_user: AuthPrincipal = Depends(get_admin_principal)
 ):
     """Get user by ID (admin only)"""
     if not ObjectId.is_valid(user_id):
@@ -68,7 +101,7 @@ async def get_user_by_id(
         )
     
     db = get_database()
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_RESPONSE_PROJECTION)
     
     if not user:
         raise HTTPException(
@@ -95,7 +128,7 @@ async def update_user_by_admin(
     db = get_database()
     
     # Check if user exists
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_RESPONSE_PROJECTION)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -115,9 +148,13 @@ async def update_user_by_admin(
         {"_id": ObjectId(user_id)},
         {"$set": update_data}
     )
+    if "status" in update_data:
+        await revoke_user_tokens(user_id)
+    else:
+        invalidate_user_cache(user_id)
     
     # Return updated user
-    updated_user = await db.users.find_one({"_id": ObjectId(user_id)})
+    updated_user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_RESPONSE_PROJECTION)
     return UserResponse(**updated_user)
 
 
@@ -146,6 +183,8 @@ async def update_user_role(
         }
     )
     
+    await revoke_user_tokens(user_id)
+    
     if result.matched_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -180,6 +219,8 @@ async def update_user_status(
         }
     )
     
+    await revoke_user_tokens(user_id)
+    
     if result.matched_count == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -211,6 +252,7 @@ async def delete_user(
     db = get_database()
     
     result = await db.users.delete_one({"_id": ObjectId(user_id)})
+    await revoke_user_tokens(user_id)
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -221,10 +263,97 @@ async def delete_user(
     return {"message": "User deleted successfully"}
 
 
+@router.post("/api-keys", response_model=ApiKeyCreated, status_code=status.HTTP_201_CREATED)
+async def create_api_key(
+    api_key_data: ApiKeyCreate,
+    current_user: UserResponse = Depends(get_admin_user)
+):
+    """Issue a service API key acting as the given user (admin only)"""
+    db = get_database()
+    
+    owner = await db.users.find_one({"_id": ObjectId(api_key_data.user_id)}, {"email": 1, "role": 1, "status": 1})
+    if not owner:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    
+    key = generate_api_key()
+    key_digest = hash_api_key(key)
+    api_key_dict = {
+        "name": api_key_data.name,
+        "user_id": owner["_id"],
+        "key_digest": key_digest,
+        "key_prefix": api_key_prefix(key),
+        "created_by": ObjectId(current_user.id),
+        "created_at": datetime.utcnow(),
+        "revoked_at": None
+    }
+    
+    result = await db.api_keys.insert_one(api_key_dict)
+    api_key_dict["_id"] = result.inserted_id
+    
+    api_key_index.add(
+        result.inserted_id,
+        api_key_dict["key_prefix"],
+        key_digest,
+        AuthPrincipal(id=owner["_id"], email=owner.get("email"), role=owner["role"], status=owner["status"])
+    )
+    
+    return ApiKeyCreated(**api_key_dict, key=key)
+
+
+@router.get("/api-keys", response_model=List[ApiKeyResponse])
+async def get_api_keys(
+    include_revoked: bool = Query(False),
+    current_user: AuthPrincipal = Depends(get_admin_principal)
+):
+    """List service API keys (admin only)"""
+    db = get_database()
+    
+    query = {} if include_revoked else {"revoked_at": None}
+    api_keys_cursor = db.api_keys.find(query, {"key_digest": 0}).sort("created_at", -1)
+    
+    api_keys = []
+    async for api_key in api_keys_cursor:
+        api_keys.append(ApiKeyResponse(**api_key))
+    
+    return api_keys
+
+
+@router.delete("/api-keys/{key_id}")
+async def revoke_api_key(
+    key_id: str,
+    current_user: UserResponse = Depends(get_admin_user)
+):
+    """Revoke a service API key (admin only)"""
+    if not ObjectId.is_valid(key_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid API key ID format"
+        )
+    
+    db = get_database()
+    
+    result = await db.api_keys.update_one(
+        {"_id": ObjectId(key_id), "revoked_at": None},
+        {"$set": {"revoked_at": datetime.utcnow()}}
+    )
+    api_key_index.remove(key_id)
+    
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="API key not found"
+        )
+    
+    return {"message": "API key revoked"}
+
+
 @router.get("/stats/system")
-async def get_system_stats(current_user: UserResponse = Depends(get_admin_user)):
+async def get_system_stats(current_user: AuthPrincipal = Depends(get_admin_principal)):
     """Get system-wide statistics (admin only)"""
-    db = get_database()
+    db = get_analytics_database()
     
     # User statistics
     total_users = await db.users.count_documents({})
@@ -273,11 +402,52 @@ async def get_system_stats(current_user: UserResponse = Depends(get_admin_user))
     }
 
 
+@router.get("/stats/runtime")
+async def get_runtime_stats(current_user: AuthPrincipal = Depends(get_admin_principal)):
+    """Get in-process cache and performance counters (admin only)"""
+    return {
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "ticket_cache": ticket_cache.stats(),
+        "last_login_tracker": last_login_tracker.stats(),
+        "counter_buffer": counter_buffer.stats(),
+        "insert_batcher": insert_batcher.stats(),
+        "password_hashing": password_hashing_pool.stats(),
+        "login_throttle": {"rejected": login_throttle.rejected},
+        "api_keys": api_key_index.stats(),
+        "db_commands_by_route": route_db_stats.stats(),
+        "db_pool": pool_monitor.stats(),
+        "slow_query_log": slow_query_log.stats(),
+        "change_stream": change_stream.stats(),
+        "leases": lease_manager.stats()
+    }
+
+
+@router.get("/stats/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=100),
+    hours: Optional[int] = Query(None, ge=1),
+    current_user: AuthPrincipal = Depends(get_admin_principal)
+):
+    """Get the slowest recorded query shapes grouped by fingerprint (admin only)"""
+    if not slow_query_log.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Slow query log is disabled"
+        )
+    
+    since = datetime.utcnow() - timedelta(hours=hours) if hours else None
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "shapes": await slow_query_log.slowest_shapes(limit=limit, since=since)
+    }
+
+
 @router.get("/tickets/all", response_model=PaginatedTickets)
 async def get_all_tickets_admin(
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=100),
-    current_user: UserResponse = Depends(get_admin_user)
+    current_user: AuthPrincipal = Depends(get_admin_principal)
 ):
     """Get all tickets in the system (admin only)"""
     db = get_database()
@@ -287,33 +457,16 @@ async def get_all_tickets_admin(
     total = await db.tickets.count_documents({})
     pages = math.ceil(total / per_page)
     
-    # Get tickets with user data
-    pipeline = [
-        {"$sort": {"created_at": -1}},
-        {"$skip": skip},
-        {"$limit": per_page},
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "created_by",
-                "foreignField": "_id",
-                "as": "created_by_user"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "assigned_to",
-                "foreignField": "_id",
-                "as": "assigned_to_user"
-            }
-        }
-    ]
-    
-    tickets_cursor = db.tickets.aggregate(pipeline)
+    # Get tickets, then their creators and assignees in one batched users query
+    page_tickets = await db.tickets.find({}, TICKET_SUMMARY_PROJECTION).sort("created_at", -1).skip(skip).limit(per_page).to_list(per_page)
+    loaders = get_loaders()
+    await asyncio.gather(
+        loaders.users.attach(page_tickets, "created_by", "created_by_user"),
+        loaders.users.attach(page_tickets, "assigned_to", "assigned_to_user")
+    )
     tickets = []
     
-    async for ticket in tickets_cursor:
+    for ticket in page_tickets:
         # Format user profiles
         created_by_user = ticket["created_by_user"][0] if ticket["created_by_user"] else None
         assigned_to_user = ticket["assigned_to_user"][0] if ticket["assigned_to_user"] else None
@@ -384,7 +537,7 @@ async def create_ticket_for_user(
     db = get_database()
     
     # Verify the target user exists
-    target_user = await db.users.find_one({"_id": ObjectId(user_id)})
+    target_user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_PROFILE_PROJECTION)
     if not target_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -404,10 +557,12 @@ async def create_ticket_for_user(
         "message_count": 0,
         "attachments": [],
         "tags": [],
+        "version": 1,
         "created_by_admin": ObjectId(current_user.id)  # Track which admin created it
     })
     
     result = await db.tickets.insert_one(ticket_dict)
+    ticket_written(result.inserted_id)
     created_ticket = await db.tickets.find_one({"_id": result.inserted_id})
     
     # Get target user profile for response
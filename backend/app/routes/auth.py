@@ -3,7 +3,7 @@ Authentication routes for login, register, and user management
 """
 
 from datetime import datetime, timedelta
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request
 from fastapi.security import OAuth2PasswordRequestForm
 from bson import ObjectId
 
@@ -12,9 +12,11 @@ from app.database.connection import get_database
 from app.models.user import (
     UserCreate, UserLogin, UserResponse, Token, PasswordChange, UserUpdate
 )
+from app.models.projections import USER_RESPONSE_PROJECTION
+from app.utils.login_throttle import login_throttle
 from app.utils.auth import (
-    verify_password, get_password_hash, create_access_token,
-    get_current_active_user
+    verify_password_async, get_password_hash_async, password_needs_rehash, create_access_token,
+    get_current_active_user, invalidate_user_cache, revoke_user_tokens
 )
 
 router = APIRouter()
@@ -31,7 +33,7 @@ async def register_user(user_data: UserCreate):
             {"email": user_data.email},
             {"username": user_data.username}
         ]
-    })
+    }, {"email": 1, "username": 1})
     
     if existing_user:
         if existing_user.get("email") == user_data.email:
@@ -46,7 +48,7 @@ async def register_user(user_data: UserCreate):
             )
     
     # Hash password and create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     
     user_dict = user_data.dict()
     user_dict.pop("password")
@@ -59,26 +61,33 @@ async def register_user(user_data: UserCreate):
     })
     
     result = await db.users.insert_one(user_dict)
-    created_user = await db.users.find_one({"_id": result.inserted_id})
+    created_user = await db.users.find_one({"_id": result.inserted_id}, USER_RESPONSE_PROJECTION)
     
     return UserResponse(**created_user)
 
 
 @router.post("/login", response_model=Token)
-async def login_user(user_credentials: UserLogin):
+async def login_user(user_credentials: UserLogin, request: Request):
     """Authenticate user and return JWT token"""
     db = get_database()
+    client_ip = request.client.host if request.client else None
+    
+    # Count the attempt before any password hashing; locked-out emails and IPs get 429
+    reservations = await login_throttle.reserve(user_credentials.email, client_ip)
     
     # Find user by email
     user = await db.users.find_one({"email": user_credentials.email})
     
-    if not user or not verify_password(user_credentials.password, user.get("password_hash", "")):
+    if not user or not await verify_password_async(user_credentials.password, user.get("password_hash", "")):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # The password was right, so this attempt does not count as a failure
+    await login_throttle.record_success(user_credentials.email, reservations)
+    
     # Check if user is active
     if user.get("status") != "active":
         raise HTTPException(
@@ -90,17 +99,22 @@ async def login_user(user_credentials: UserLogin):
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
         data={"sub": str(user["_id"]), "email": user["email"]},
-        expires_delta=access_token_expires
+        expires_delta=access_token_expires,
+        user=user
     )
     
-    # Update last login
+    # Update last login, transparently rehashing if the stored cost is below the minimum
+    login_update = {"last_login": datetime.utcnow()}
+    if password_needs_rehash(user["password_hash"]):
+        login_update["password_hash"] = await get_password_hash_async(user_credentials.password)
+    
     await db.users.update_one(
         {"_id": user["_id"]},
-        {"$set": {"last_login": datetime.utcnow()}}
+        {"$set": login_update}
     )
     
     # Get updated user data
-    updated_user = await db.users.find_one({"_id": user["_id"]})
+    updated_user = await db.users.find_one({"_id": user["_id"]}, USER_RESPONSE_PROJECTION)
     
     return Token(
         access_token=access_token,
@@ -137,9 +151,13 @@ async def update_current_user(
         {"_id": ObjectId(current_user.id)},
         {"$set": update_data}
     )
+    if "status" in update_data:
+        await revoke_user_tokens(current_user.id)
+    else:
+        invalidate_user_cache(current_user.id)
     
     # Return updated user
-    updated_user = await db.users.find_one({"_id": ObjectId(current_user.id)})
+    updated_user = await db.users.find_one({"_id": ObjectId(current_user.id)}, USER_RESPONSE_PROJECTION)
     return UserResponse(**updated_user)
 
 
@@ -152,17 +170,17 @@ async def change_password(
     db = get_database()
     
     # Get current user with password hash
-    user = await db.users.find_one({"_id": ObjectId(current_user.id)})
+    user = await db.users.find_one({"_id": ObjectId(current_user.id)}, {"password_hash": 1})
     
     # Verify current password
-    if not verify_password(password_data.current_password, user.get("password_hash", "")):
+    if not await verify_password_async(password_data.current_password, user.get("password_hash", "")):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
     
     # Hash new password and update
-    new_password_hash = get_password_hash(password_data.new_password)
+    new_password_hash = await get_password_hash_async(password_data.new_password)
     
     await db.users.update_one(
         {"_id": ObjectId(current_user.id)},
@@ -173,5 +191,6 @@ async def change_password(
             }
         }
     )
+    invalidate_user_cache(current_user.id)
     
     return {"message": "Password changed successfully"} 
\ No newline at end of file
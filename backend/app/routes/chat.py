@@ -8,16 +8,29 @@ from fastapi import APIRouter, HTTPException, status, Depends, Query
 from bson import ObjectId
 
 from app.database.connection import get_database
-from app.models.user import UserResponse, UserProfile
+from app.database.counters import counter_buffer
+from app.database.inserts import insert_batcher
+from app.database.loaders import get_loaders
+from app.models.user import UserResponse, UserProfile, AuthPrincipal
 from app.models.message import (
     MessageCreate, MessageResponse, MessageUpdate, PaginatedMessages,
     ConversationResponse, MessageType, MessageStatus
 )
-from app.utils.auth import get_current_active_user, check_ticket_permissions
+from app.utils.auth import get_current_active_user, get_current_active_principal, check_ticket_permissions
 
 router = APIRouter()
 
 
+def build_message_page_pipeline(query: dict, skip: int, limit: int) -> list:
+    """Build the message page pipeline in chat order; senders are attached by the user loader"""
+    return [
+        {"$match": query},
+        {"$sort": {"created_at": 1}},  # Ascending order for chat
+        {"$skip": skip},
+        {"$limit": limit}
+    ]
+
+
 @router.post("/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
 async def send_message(
     message_data: MessageCreate,
@@ -32,8 +45,6 @@ async def send_message(
             detail="Not authorized to send messages to this ticket"
         )
     
-    db = get_database()
-    
     # Create message document
     message_dict = message_data.dict()
     message_dict.update({
@@ -47,20 +58,17 @@ async def send_message(
         "reply_to": None
     })
     
-    result = await db.messages.insert_one(message_dict)
+    # Grouped with concurrent inserts; message_dict gets its _id
+    await insert_batcher.insert("messages", message_dict)
     
-    # Update ticket message count
-    await db.tickets.update_one(
-        {"_id": ObjectId(message_data.ticket_id)},
-        {
-            "$inc": {"message_count": 1},
-            "$set": {"updated_at": datetime.utcnow()}
-        }
+    # Update ticket message count (buffered, flushed in bulk)
+    counter_buffer.increment(
+        "tickets",
+        ObjectId(message_data.ticket_id),
+        inc={"message_count": 1},
+        max_fields={"updated_at": datetime.utcnow()}
     )
     
-    # Get the created message with sender info
-    created_message = await db.messages.find_one({"_id": result.inserted_id})
-    
     # Create sender profile
     sender_profile = UserProfile(
         _id=current_user.id,
@@ -72,8 +80,7 @@ async def send_message(
     )
     
     # Add sender to the message data before creating MessageResponse
-    created_message["sender"] = sender_profile
-    message_response = MessageResponse(**created_message)
+    message_response = MessageResponse(**message_dict, sender=sender_profile)
     
     return message_response
 
@@ -83,7 +90,7 @@ async def get_ticket_messages(
     ticket_id: str,
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
-    current_user: UserResponse = Depends(get_current_active_user)
+    current_user: AuthPrincipal = Depends(get_current_active_principal)
 ):
     """Get messages for a specific ticket"""
     if not ObjectId.is_valid(ticket_id):
@@ -113,25 +120,13 @@ async def get_ticket_messages(
     pages = math.ceil(total / per_page)
     
     # Get messages with sender info
-    pipeline = [
-        {"$match": query},
-        {"$sort": {"created_at": 1}},  # Ascending order for chat
-        {"$skip": skip},
-        {"$limit": per_page},
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "sender_id",
-                "foreignField": "_id",
-                "as": "sender_user"
-            }
-        }
-    ]
+    pipeline = build_message_page_pipeline(query, skip, per_page)
     
-    messages_cursor = db.messages.aggregate(pipeline)
+    page_messages = await db.messages.aggregate(pipeline).to_list(per_page)
+    await get_loaders().users.attach(page_messages, "sender_id", "sender_user")
     messages = []
     
-    async for message in messages_cursor:
+    for message in page_messages:
         # Format sender profile
         sender_user = message["sender_user"][0] if message["sender_user"] else None
         
@@ -165,7 +160,7 @@ async def get_ticket_messages(
 @router.get("/tickets/{ticket_id}/conversation", response_model=ConversationResponse)
 async def get_ticket_conversation(
     ticket_id: str,
-    current_user: UserResponse = Depends(get_current_active_user)
+    current_user: AuthPrincipal = Depends(get_current_active_principal)
 ):
     """Get full conversation for a ticket"""
     if not ObjectId.is_valid(ticket_id):
@@ -184,26 +179,15 @@ async def get_ticket_conversation(
     
     db = get_database()
     
-    # Get all messages for the ticket
-    pipeline = [
-        {"$match": {"ticket_id": ObjectId(ticket_id)}},
-        {"$sort": {"created_at": 1}},
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "sender_id",
-                "foreignField": "_id",
-                "as": "sender_user"
-            }
-        }
-    ]
-    
-    messages_cursor = db.messages.aggregate(pipeline)
+    # Get all messages for the ticket with their senders
+    all_messages = await db.messages.find({"ticket_id": ObjectId(ticket_id)}).sort("created_at", 1).to_list(None)
+    loaders = get_loaders()
+    await loaders.users.attach(all_messages, "sender_id", "sender_user")
     messages = []
     participants_set = set()
     last_activity = None
     
-    async for message in messages_cursor:
+    for message in all_messages:
         # Format sender profile
         sender_user = message["sender_user"][0] if message["sender_user"] else None
         
@@ -225,15 +209,12 @@ async def get_ticket_conversation(
             participants_set.add(str(sender_user["_id"]))
             last_activity = message["created_at"]
     
-    # Get participant profiles
+    # Get participant profiles (already loaded with the senders)
     participants = []
     if participants_set:
-        participants_cursor = db.users.find({
-            "_id": {"$in": [ObjectId(pid) for pid in participants_set]}
-        })
-        
-        async for user in participants_cursor:
-            participants.append(UserProfile(**user))
+        for user in await loaders.users.load_many(participants_set):
+            if user:
+                participants.append(UserProfile(**user))
     
     return ConversationResponse(
         ticket_id=ObjectId(ticket_id),
@@ -336,8 +317,5 @@ async def delete_message(
     # Delete message
     await db.messages.delete_one({"_id": ObjectId(message_id)})
     
-    # Update ticket message count
-    await db.tickets.update_one(
-        {"_id": message["ticket_id"]},
-        {"$inc": {"message_count": -1}}
-    ) 
\ No newline at end of file
+    # Update ticket message count (buffered, flushed in bulk)
+    counter_buffer.increment("tickets", message["ticket_id"], inc={"message_count": -1}) 
\ No newline at end of file
@@ -9,79 +9,113 @@ from fastapi import APIRouter, HTTPException, status, Depends, Query
 from fastapi.responses import RedirectResponse
 from bson import ObjectId
 
-from app.database.connection import get_database
-from app.models.user import UserResponse, UserRole
+from app.database.connection import get_database, get_analytics_database
+from app.database.inserts import insert_batcher
+from app.database.loaders import get_loaders
+from app.models.user import UserResponse, UserRole, AuthPrincipal
 from app.models.notification import (
     NotificationCreate, NotificationResponse, NotificationUpdate,
     PaginatedNotifications, NotificationStats, BulkNotificationUpdate,
-    NotificationSummary, NotificationType
+    NotificationSummary, NotificationType, FRONTEND_NOTIFICATION_TYPES, normalize_notification_types
+)
+from app.utils.auth import (
+    get_current_active_user, get_agent_or_admin_user,
+    get_current_active_principal, get_agent_or_admin_principal
 )
-from app.utils.auth import get_current_active_user, get_agent_or_admin_user
 from app.services.notification_service import notification_service
 
 router = APIRouter()
 
 
+def build_notification_query(user_id, unread_only: bool = False) -> dict:
+    """Build the notification listing filter for a user"""
+    query = {"user_id": ObjectId(user_id)}
+    if unread_only:
+        query["is_read"] = False
+    return query
+
+
+def build_notification_page(query: dict, skip: int, limit: int) -> dict:
+    """Build the find arguments for a page of a user's notifications, newest first"""
+    return {"filter": query, "sort": [("created_at", -1)], "skip": skip, "limit": limit}
+
+
+def build_admin_notification_query(
+    user_id: Optional[str] = None,
+    notification_type: Optional[str] = None,
+    priority: Optional[str] = None,
+    unread_only: bool = False,
+    days_back: Optional[int] = None
+) -> dict:
+    """Build the admin notification listing filter"""
+    query = {}
+    
+    # Filter by user if specified
+    if user_id:
+        query["user_id"] = ObjectId(user_id)
+    
+    # Filter by notification type
+    if notification_type:
+        query["notification_type"] = notification_type
+    
+    # Filter by priority
+    if priority:
+        query["priority"] = priority
+    
+    # Filter by read status
+    if unread_only:
+        query["is_read"] = False
+    
+    # Filter by date range
+    if days_back:
+        start_date = datetime.utcnow() - timedelta(days=days_back)
+        query["created_at"] = {"$gte": start_date}
+    
+    return query
+
+
+def build_admin_notification_pipeline(query: dict, skip: int, limit: int) -> list:
+    """Build the admin notification listing pipeline, newest first; recipients are attached by the user loader"""
+    return [
+        {"$match": query},
+        {"$sort": {"created_at": -1}},
+        {"$skip": skip},
+        {"$limit": limit}
+    ]
+
+
 @router.get("/", response_model=PaginatedNotifications)
 async def get_notifications(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
     unread_only: bool = Query(False),
-    current_user: UserResponse = Depends(get_current_active_user)
+    current_user: AuthPrincipal = Depends(get_current_active_principal)
 ):
     """Get user notifications with pagination"""
     db = get_database()
     
     # Build query
-    query = {"user_id": ObjectId(current_user.id)}
-    if unread_only:
-        query["is_read"] = False
+    query = build_notification_query(current_user.id, unread_only)
     
     # Count total and unread notifications
     total = await db.notifications.count_documents(query)
-    unread_count = await db.notifications.count_documents({
-        "user_id": ObjectId(current_user.id),
-        "is_read": False
-    })
+    unread_count = await db.notifications.count_documents(build_notification_query(current_user.id, True))
     
     # Calculate pagination
     skip = (page - 1) * per_page
     pages = math.ceil(total / per_page)
     
     # Get notifications
-    notifications_cursor = db.notifications.find(query).sort("created_at", -1).skip(skip).limit(per_page)
+    notifications_cursor = db.notifications.find(**build_notification_page(query, skip, per_page))
     
     notifications = []
     async for notification in notifications_cursor:
-        # Fix notification_type mapping for legacy data
-        notification_type = notification.get("notification_type", "")
-        if notification_type == "assignment":
-            notification_type = "ticket_assigned"
-        elif notification_type not in ["ticket_created", "ticket_assigned", "ticket_status_changed", "new_message", "ticket_resolved", "system_alert", "reminder"]:
-            notification_type = "system_alert"  # Default fallback
-        
-        # Set type field for frontend (if missing)
-        type_field = notification.get("type", "")
-        if not type_field:
-            # Map notification_type to frontend type
-            type_mapping = {
-                "ticket_created": "new_ticket",
-                "ticket_assigned": "assignment", 
-                "ticket_status_changed": "ticket_update",
-                "new_message": "message",
-                "ticket_resolved": "ticket_resolved",
-                "system_alert": "urgent",
-                "reminder": "reminder"
-            }
-            type_field = type_mapping.get(notification_type, "urgent")
-        
-        # Create notification summary with fixed data
         notification_data = {
             "_id": notification["_id"],
             "title": notification.get("title", "Notification"),
             "message": notification.get("message", ""),
-            "type": type_field,
-            "notification_type": notification_type,
+            # Rows not yet rewritten by migration 1 (python migrate.py --apply) are mapped here
+            **normalize_notification_types(notification),
             "priority": notification.get("priority", "medium"),
             "is_read": notification.get("is_read", False),
             "created_at": notification.get("created_at", datetime.utcnow())
@@ -107,9 +141,9 @@ async def get_notifications(
 
 
 @router.get("/stats/overview", response_model=NotificationStats)
-async def get_notification_stats(current_user: UserResponse = Depends(get_current_active_user)):
+async def get_notification_stats(current_user: AuthPrincipal = Depends(get_current_active_principal)):
     """Get notification statistics for current user"""
-    db = get_database()
+    db = get_analytics_database()
     
     # Basic counts
     total_notifications = await db.notifications.count_documents({"user_id": ObjectId(current_user.id)})
@@ -147,7 +181,7 @@ async def get_notification_stats(current_user: UserResponse = Depends(get_curren
 @router.get("/{notification_id}", response_model=NotificationResponse)
 async def get_notification(
     notification_id: str,
-    current_user: UserResponse = Depends(get_current_active_user)
+    current_user: AuthPrincipal = Depends(get_current_active_principal)
 ):
     """Get a specific notification"""
     if not ObjectId.is_valid(notification_id):
@@ -319,20 +353,18 @@ async def create_notification(
     current_user: UserResponse = Depends(get_agent_or_admin_user)
 ):
     """Create a notification (admin/agent only)"""
-    db = get_database()
-    
     # Create notification document
     notification_dict = notification_data.dict()
     notification_dict.update({
+        "type": FRONTEND_NOTIFICATION_TYPES.get(notification_dict["notification_type"], "urgent"),
         "is_read": False,
         "read_at": None,
         "created_at": datetime.utcnow()
     })
     
-    result = await db.notifications.insert_one(notification_dict)
-    created_notification = await db.notifications.find_one({"_id": result.inserted_id})
+    await insert_batcher.insert("notifications", notification_dict)
     
-    return NotificationResponse(**created_notification)
+    return NotificationResponse(**notification_dict)
 
 
 # Admin-specific endpoints
@@ -345,39 +377,19 @@ async def get_all_notifications_admin(
     priority: Optional[str] = Query(None),
     unread_only: bool = Query(False),
     days_back: Optional[int] = Query(None, ge=1, le=365),
-    current_user: UserResponse = Depends(get_agent_or_admin_user)
+    current_user: AuthPrincipal = Depends(get_agent_or_admin_principal)
 ):
     """Get all notifications for admin dashboard with advanced filtering"""
     db = get_database()
     
-    # Build query
-    query = {}
-    
-    # Filter by user if specified
-    if user_id:
-        if not ObjectId.is_valid(user_id):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid user ID format"
-            )
-        query["user_id"] = ObjectId(user_id)
-    
-    # Filter by notification type
-    if notification_type:
-        query["notification_type"] = notification_type
-    
-    # Filter by priority
-    if priority:
-        query["priority"] = priority
-    
-    # Filter by read status
-    if unread_only:
-        query["is_read"] = False
+    if user_id and not ObjectId.is_valid(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid user ID format"
+        )
     
-    # Filter by date range
-    if days_back:
-        start_date = datetime.utcnow() - timedelta(days=days_back)
-        query["created_at"] = {"$gte": start_date}
+    # Build query
+    query = build_admin_notification_query(user_id, notification_type, priority, unread_only, days_back)
     
     # Count total notifications
     total = await db.notifications.count_documents(query)
@@ -387,25 +399,13 @@ async def get_all_notifications_admin(
     pages = math.ceil(total / per_page)
     
     # Get notifications with user info
-    pipeline = [
-        {"$match": query},
-        {"$sort": {"created_at": -1}},
-        {"$skip": skip},
-        {"$limit": per_page},
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "user_id",
-                "foreignField": "_id",
-                "as": "user_info"
-            }
-        }
-    ]
+    pipeline = build_admin_notification_pipeline(query, skip, per_page)
     
-    notifications_cursor = db.notifications.aggregate(pipeline)
+    page_notifications = await db.notifications.aggregate(pipeline).to_list(per_page)
+    await get_loaders().users.attach(page_notifications, "user_id", "user_info")
     notifications = []
     
-    async for notification in notifications_cursor:
+    for notification in page_notifications:
         user_info = notification["user_info"][0] if notification["user_info"] else {}
         
         # Add user info to notification data
@@ -479,7 +479,7 @@ async def create_system_notification(
     target_users = await db.users.find({
         "role": {"$in": target_roles},
         "is_active": True
-    }).to_list(None)
+    }, {"_id": 1}).to_list(None)
     
     if not target_users:
         raise HTTPException(
@@ -517,10 +517,10 @@ async def create_system_notification(
 
 @router.get("/admin/stats/system", response_model=dict)
 async def get_system_notification_stats(
-    current_user: UserResponse = Depends(get_agent_or_admin_user)
+    current_user: AuthPrincipal = Depends(get_agent_or_admin_principal)
 ):
     """Get system-wide notification statistics for admin dashboard"""
-    db = get_database()
+    db = get_analytics_database()
     
     # Overall counts
     total_notifications = await db.notifications.count_documents({})
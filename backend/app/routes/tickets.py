@@ -2,29 +2,144 @@
 Ticket management routes for CRUD operations
 """
 
+import asyncio
 import math
 from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Header, Response
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from app.config import settings
-from app.database.connection import get_database
-from app.models.user import UserResponse, UserRole, UserProfile
+from app.database.connection import get_database, get_analytics_database, causal_session
+from app.database.loaders import get_loaders, ticket_written
+from app.models.user import UserResponse, UserRole, UserProfile, AuthPrincipal
+from app.models.projections import TICKET_SUMMARY_PROJECTION
 from app.models.ticket import (
     TicketCreate, TicketUpdate, TicketResponse, TicketSummary,
     TicketAssign, TicketStatusUpdate, PaginatedTickets, TicketStats,
     TicketStatus, TicketPriority, TicketCategory
 )
-from app.utils.auth import get_current_active_user, get_agent_or_admin_user, check_ticket_permissions
+from app.utils.auth import (
+    get_current_active_user, get_agent_or_admin_user, check_ticket_permissions,
+    get_current_active_principal, get_agent_or_admin_principal
+)
 from app.services.notification_service import notification_service
 
 router = APIRouter()
 
 
+def build_ticket_list_query(
+    current_user: AuthPrincipal,
+    status: Optional[str] = None,
+    priority: Optional[str] = None,
+    category: Optional[str] = None,
+    search: Optional[str] = None
+) -> dict:
+    """Build the ticket listing filter for a user"""
+    query = {}
+    
+    # For customers, only show their tickets
+    if current_user.role == UserRole.CUSTOMER:
+        query["created_by"] = ObjectId(current_user.id)
+    
+    # Add filters
+    if status:
+        query["status"] = status
+    if priority:
+        query["priority"] = priority
+    if category:
+        query["category"] = category
+    if search:
+        query["$text"] = {"$search": search}
+    
+    return query
+
+
+def build_ticket_list_pipeline(query: dict, skip: int, limit: int) -> list:
+    """Build the ticket listing pipeline, newest first; creators and assignees are attached by the user loader"""
+    return [
+        {"$match": query},
+        {"$sort": {"created_at": -1}},
+        {"$skip": skip},
+        {"$limit": limit},
+        {"$project": TICKET_SUMMARY_PROJECTION}
+    ]
+
+
+def ticket_etag(version: int) -> str:
+    """Strong ETag for a ticket version"""
+    return f'"{version}"'
+
+
+def parse_if_match(if_match: Optional[str]) -> Optional[int]:
+    """Ticket version required by an If-Match header; None when absent or *"""
+    if if_match is None or if_match.strip() == "*":
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"')
+    if not value.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="If-Match must be a ticket ETag"
+        )
+    return int(value)
+
+
+def version_filter(version: int) -> dict:
+    """Filter matching a ticket version; tickets created before versioning have no field and count as 0"""
+    return {"$in": [0, None]} if version == 0 else version
+
+
+async def load_ticket_response(ticket_id: str) -> TicketResponse:
+    """Load a ticket with creator and assignee profiles"""
+    ticket = await get_loaders().tickets.load(ticket_id)
+    
+    if not ticket:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ticket not found"
+        )
+    
+    return await build_ticket_response(ticket)
+
+
+async def build_ticket_response(ticket: dict) -> TicketResponse:
+    """Build a ticket response from a ticket document, attaching creator and assignee profiles"""
+    loaders = get_loaders()
+    
+    # Get user data
+    ticket = dict(ticket)
+    await asyncio.gather(
+        loaders.users.attach([ticket], "created_by", "created_by_user"),
+        loaders.users.attach([ticket], "assigned_to", "assigned_to_user")
+    )
+    
+    # Format user profiles
+    created_by_user = ticket["created_by_user"][0] if ticket["created_by_user"] else None
+    assigned_to_user = ticket["assigned_to_user"][0] if ticket["assigned_to_user"] else None
+    
+    created_by = UserProfile(**created_by_user) if created_by_user else None
+    assigned_to = UserProfile(**assigned_to_user) if assigned_to_user else None
+    
+    # Create ticket response data excluding user fields that need special formatting
+    ticket_data = {k: v for k, v in ticket.items() if k not in ["created_by_user", "assigned_to_user", "created_by", "assigned_to"]}
+    
+    # Add the properly formatted user profiles
+    ticket_data["created_by"] = created_by
+    ticket_data["assigned_to"] = assigned_to
+    
+    ticket_response = TicketResponse(**ticket_data)
+    
+    return ticket_response
+
+
 @router.post("/", response_model=TicketResponse, status_code=status.HTTP_201_CREATED)
 async def create_ticket(
     ticket_data: TicketCreate,
+    response: Response,
     current_user: UserResponse = Depends(get_current_active_user)
 ):
     """Create a new support ticket"""
@@ -42,11 +157,15 @@ async def create_ticket(
         "resolution_note": None,
         "message_count": 0,
         "attachments": [],
-        "tags": []
+        "tags": [],
+        "version": 1
     })
     
-    result = await db.tickets.insert_one(ticket_dict)
-    created_ticket = await db.tickets.find_one({"_id": result.inserted_id})
+    # Read back inside the same causal session so the new ticket is visible
+    async with causal_session() as session:
+        result = await db.tickets.insert_one(ticket_dict, session=session)
+        ticket_written(result.inserted_id)
+        created_ticket = await db.tickets.find_one({"_id": result.inserted_id}, session=session)
     
     # Get user profile for response
     user_profile = UserProfile(
@@ -69,6 +188,7 @@ async def create_ticket(
     # Send real-time notifications to admins/agents about new ticket
     await notification_service.notify_new_ticket(str(result.inserted_id))
     
+    response.headers["ETag"] = ticket_etag(ticket_response.version)
     return ticket_response
 
 
@@ -80,27 +200,13 @@ async def get_tickets(
     priority: Optional[str] = None,
     category: Optional[str] = None,
     search: Optional[str] = None,
-    current_user: UserResponse = Depends(get_current_active_user)
+    current_user: AuthPrincipal = Depends(get_current_active_principal)
 ):
     """Get paginated list of tickets"""
     db = get_database()
     
     # Build query filter
-    query = {}
-    
-    # For customers, only show their tickets
-    if current_user.role == UserRole.CUSTOMER:
-        query["created_by"] = ObjectId(current_user.id)
-    
-    # Add filters
-    if status:
-        query["status"] = status
-    if priority:
-        query["priority"] = priority
-    if category:
-        query["category"] = category
-    if search:
-        query["$text"] = {"$search": search}
+    query = build_ticket_list_query(current_user, status, priority, category, search)
     
     # Count total tickets
     total = await db.tickets.count_documents(query)
@@ -110,33 +216,17 @@ async def get_tickets(
     pages = math.ceil(total / per_page)
     
     # Get tickets with user data
-    pipeline = [
-        {"$match": query},
-        {"$sort": {"created_at": -1}},
-        {"$skip": skip},
-        {"$limit": per_page},
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "created_by",
-                "foreignField": "_id",
-                "as": "created_by_user"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "assigned_to",
-                "foreignField": "_id",
-                "as": "assigned_to_user"
-            }
-        }
-    ]
+    pipeline = build_ticket_list_pipeline(query, skip, per_page)
     
-    tickets_cursor = db.tickets.aggregate(pipeline)
+    page_tickets = await db.tickets.aggregate(pipeline).to_list(per_page)
+    loaders = get_loaders()
+    await asyncio.gather(
+        loaders.users.attach(page_tickets, "created_by", "created_by_user"),
+        loaders.users.attach(page_tickets, "assigned_to", "assigned_to_user")
+    )
     tickets = []
     
-    async for ticket in tickets_cursor:
+    for ticket in page_tickets:
         # Format user profiles
         created_by_user = ticket["created_by_user"][0] if ticket["created_by_user"] else None
         assigned_to_user = ticket["assigned_to_user"][0] if ticket["assigned_to_user"] else None
@@ -184,7 +274,8 @@ async def get_tickets(
 @router.get("/{ticket_id}", response_model=TicketResponse)
 async def get_ticket(
     ticket_id: str,
-    current_user: UserResponse = Depends(get_current_active_user)
+    response: Response,
+    current_user: AuthPrincipal = Depends(get_current_active_principal)
 ):
     """Get a specific ticket by ID"""
     if not ObjectId.is_valid(ticket_id):
@@ -201,55 +292,8 @@ async def get_ticket(
             detail="Not authorized to access this ticket"
         )
     
-    db = get_database()
-    
-    # Get ticket with user data
-    pipeline = [
-        {"$match": {"_id": ObjectId(ticket_id)}},
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "created_by",
-                "foreignField": "_id",
-                "as": "created_by_user"
-            }
-        },
-        {
-            "$lookup": {
-                "from": "users",
-                "localField": "assigned_to",
-                "foreignField": "_id",
-                "as": "assigned_to_user"
-            }
-        }
-    ]
-    
-    result = await db.tickets.aggregate(pipeline).to_list(1)
-    
-    if not result:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Ticket not found"
-        )
-    
-    ticket = result[0]
-    
-    # Format user profiles
-    created_by_user = ticket["created_by_user"][0] if ticket["created_by_user"] else None
-    assigned_to_user = ticket["assigned_to_user"][0] if ticket["assigned_to_user"] else None
-    
-    created_by = UserProfile(**created_by_user) if created_by_user else None
-    assigned_to = UserProfile(**assigned_to_user) if assigned_to_user else None
-    
-    # Create ticket response data excluding user fields that need special formatting
-    ticket_data = {k: v for k, v in ticket.items() if k not in ["created_by_user", "assigned_to_user", "created_by", "assigned_to"]}
-    
-    # Add the properly formatted user profiles
-    ticket_data["created_by"] = created_by
-    ticket_data["assigned_to"] = assigned_to
-    
-    ticket_response = TicketResponse(**ticket_data)
-    
+    ticket_response = await load_ticket_response(ticket_id)
+    response.headers["ETag"] = ticket_etag(ticket_response.version)
     return ticket_response
 
 
@@ -257,14 +301,17 @@ async def get_ticket(
 async def update_ticket(
     ticket_id: str,
     ticket_update: TicketUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None, description="ETag of the ticket version being edited"),
     current_user: UserResponse = Depends(get_current_active_user)
 ):
-    """Update a ticket"""
+    """Update a ticket; with If-Match the update only applies to that version"""
     if not ObjectId.is_valid(ticket_id):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid ticket ID format"
         )
+    expected_version = parse_if_match(if_match)
     
     # Check permissions
     has_permission = await check_ticket_permissions(ticket_id, current_user)
@@ -275,20 +322,23 @@ async def update_ticket(
         )
     
     db = get_database()
+    loaders = get_loaders()
     
-    # Get original ticket for comparison
-    original_ticket = await db.tickets.find_one({"_id": ObjectId(ticket_id)})
-    if not original_ticket:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Ticket not found"
-        )
+    # Already loaded by the permission check
+    original_ticket = await loaders.tickets.load(ticket_id)
     
     # Prepare update data
     update_data = {k: v for k, v in ticket_update.dict().items() if v is not None}
     
     if not update_data:
-        return await get_ticket(ticket_id, current_user)
+        if expected_version is not None and original_ticket.get("version", 0) != expected_version:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Ticket was modified by someone else; reload it and retry"
+            )
+        ticket_response = await build_ticket_response(original_ticket)
+        response.headers["ETag"] = ticket_etag(ticket_response.version)
+        return ticket_response
     
     update_data["updated_at"] = datetime.utcnow()
     
@@ -300,16 +350,29 @@ async def update_ticket(
     if new_status == TicketStatus.RESOLVED:
         update_data["resolved_at"] = datetime.utcnow()
     
-    result = await db.tickets.update_one(
-        {"_id": ObjectId(ticket_id)},
-        {"$set": update_data}
+    # One round trip: apply only to the expected version and return the post-image
+    query = {"_id": ObjectId(ticket_id)}
+    if expected_version is not None:
+        query["version"] = version_filter(expected_version)
+    
+    updated_ticket = await db.tickets.find_one_and_update(
+        query,
+        {"$set": update_data, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER
     )
     
-    if result.matched_count == 0:
+    if updated_ticket is None:
+        if expected_version is not None:
+            raise HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED,
+                detail="Ticket was modified by someone else; reload it and retry"
+            )
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Ticket not found"
         )
+    ticket_written(ticket_id)
+    loaders.tickets.prime(ticket_id, updated_ticket)
     
     # Send notifications for status changes
     if new_status and old_status != new_status:
@@ -329,7 +392,9 @@ async def update_ticket(
                 str(current_user.id)
             )
     
-    return await get_ticket(ticket_id, current_user)
+    ticket_response = await build_ticket_response(updated_ticket)
+    response.headers["ETag"] = ticket_etag(ticket_response.version)
+    return ticket_response
 
 
 @router.post("/{ticket_id}/assign")
@@ -346,9 +411,15 @@ async def assign_ticket(
         )
     
     db = get_database()
+    loaders = get_loaders()
+    
+    # Load the ticket and the assignee together
+    ticket, assigned_user = await asyncio.gather(
+        loaders.tickets.load(ticket_id),
+        loaders.users.load(assignment.assigned_to)
+    )
     
     # Verify ticket exists
-    ticket = await db.tickets.find_one({"_id": ObjectId(ticket_id)})
     if not ticket:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -356,7 +427,6 @@ async def assign_ticket(
         )
     
     # Verify assigned user exists and is an agent/admin
-    assigned_user = await db.users.find_one({"_id": ObjectId(assignment.assigned_to)})
     if not assigned_user or assigned_user["role"] not in [UserRole.AGENT, UserRole.ADMIN]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -371,9 +441,11 @@ async def assign_ticket(
                 "assigned_to": ObjectId(assignment.assigned_to),
                 "status": TicketStatus.IN_PROGRESS,
                 "updated_at": datetime.utcnow()
-            }
+            },
+            "$inc": {"version": 1}
         }
     )
+    ticket_written(ticket_id)
     
     # Send notification to assigned user
     await notification_service.notify_ticket_assignment(
@@ -409,6 +481,7 @@ async def delete_ticket(
     db = get_database()
     
     result = await db.tickets.delete_one({"_id": ObjectId(ticket_id)})
+    ticket_written(ticket_id)
     
     if result.deleted_count == 0:
         raise HTTPException(
@@ -418,9 +491,9 @@ async def delete_ticket(
 
 
 @router.get("/stats/overview", response_model=TicketStats)
-async def get_ticket_stats(current_user: UserResponse = Depends(get_agent_or_admin_user)):
+async def get_ticket_stats(current_user: AuthPrincipal = Depends(get_agent_or_admin_principal)):
     """Get ticket statistics (admin/agent only)"""
-    db = get_database()
+    db = get_analytics_database()
     
     # Basic counts
     total_tickets = await db.tickets.count_documents({})
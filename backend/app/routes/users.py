@@ -7,21 +7,22 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from bson import ObjectId
 
 from app.database.connection import get_database
-from app.models.user import UserResponse, UserProfile, UserRole
-from app.utils.auth import get_current_active_user, get_agent_or_admin_user
+from app.models.user import AuthPrincipal, UserProfile, UserRole
+from app.models.projections import USER_PROFILE_PROJECTION
+from app.utils.auth import get_current_active_principal
 
 router = APIRouter()
 
 
 @router.get("/agents", response_model=List[UserProfile])
-async def get_agents(current_user: UserResponse = Depends(get_current_active_user)):
+async def get_agents(current_user: AuthPrincipal = Depends(get_current_active_principal)):
     """Get list of all agents and admins"""
     db = get_database()
     
     agents_cursor = db.users.find({
         "role": {"$in": [UserRole.AGENT, UserRole.ADMIN]},
         "status": "active"
-    })
+    }, USER_PROFILE_PROJECTION)
     
     agents = []
     async for user in agents_cursor:
@@ -33,7 +34,7 @@ async def get_agents(current_user: UserResponse = Depends(get_current_active_use
 @router.get("/{user_id}", response_model=UserProfile)
 async def get_user_profile(
     user_id: str,
-    current_user: UserResponse = Depends(get_current_active_user)
+    current_user: AuthPrincipal = Depends(get_current_active_principal)
 ):
     """Get user profile by ID"""
     if not ObjectId.is_valid(user_id):
@@ -43,7 +44,7 @@ async def get_user_profile(
         )
     
     db = get_database()
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
+    user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_PROFILE_PROJECTION)
     
     if not user:
         raise HTTPException(
@@ -0,0 +1,110 @@
+"""
+Write-behind tracker for user last_login timestamps
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from app.config import settings
+from app.database.connection import get_database
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginTracker:
+    """Coalesce last_login updates in memory and flush them as one bulk write"""
+    
+    def __init__(self, flush_interval_seconds: float, granularity_seconds: float):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.granularity = timedelta(seconds=granularity_seconds)
+        # Newest timestamp per user waiting to be written
+        self._pending: Dict[str, datetime] = {}
+        # Last value known to be stored per user
+        self._stored: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.writes = 0
+        self.skipped = 0
+    
+    def record(self, user_id: str, timestamp: Optional[datetime] = None, stored: Optional[datetime] = None) -> None:
+        """Record activity for a user; stored is the last_login value already persisted, if known"""
+        timestamp = timestamp or datetime.utcnow()
+        
+        if stored is not None and user_id not in self._stored:
+            self._stored[user_id] = stored
+        
+        previous = self._pending.get(user_id) or self._stored.get(user_id)
+        if previous is not None and timestamp - previous < self.granularity:
+            self.skipped += 1
+            return
+        
+        self._pending[user_id] = timestamp
+    
+    async def flush(self) -> int:
+        """Write all pending timestamps in a single bulk write"""
+        if not self._pending:
+            return 0
+        
+        pending, self._pending = self._pending, {}
+        operations = [
+            UpdateOne({"_id": ObjectId(user_id)}, {"$max": {"last_login": timestamp}})
+            for user_id, timestamp in pending.items()
+        ]
+        
+        try:
+            db = get_database()
+            await db.users.bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error(f"Error flushing last_login updates: {e}")
+            # Put the timestamps back unless newer ones arrived meanwhile
+            for user_id, timestamp in pending.items():
+                if user_id not in self._pending or self._pending[user_id] < timestamp:
+                    self._pending[user_id] = timestamp
+            return 0
+        
+        self._stored.update(pending)
+        self.flushes += 1
+        self.writes += len(operations)
+        return len(operations)
+    
+    async def _run(self) -> None:
+        """Flush periodically until cancelled"""
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+    
+    def start(self) -> None:
+        """Start the periodic flush task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the periodic flush task and write anything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+    
+    def stats(self) -> Dict[str, int]:
+        """Get tracker counters"""
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "writes": self.writes,
+            "skipped": self.skipped
+        }
+
+
+# Create tracker instance
+last_login_tracker = LastLoginTracker(
+    flush_interval_seconds=settings.last_login_flush_interval_seconds,
+    granularity_seconds=settings.last_login_granularity_seconds
+)
@@ -2,13 +2,17 @@
 Notification service for creating and broadcasting notifications
 """
 
+import asyncio
 import logging
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 from bson import ObjectId
 
 from app.database.connection import get_database
-from app.models.notification import NotificationType, NotificationCreate, NotificationResponse
+from app.database.inserts import insert_batcher
+from app.database.loaders import get_loaders
+from app.models.notification import NotificationType, NotificationCreate, NotificationResponse, FRONTEND_NOTIFICATION_TYPES
+from app.models.projections import USER_CONTACT_PROJECTION, user_lookup
 from app.models.user import UserRole
 from app.websocket.manager import manager
 
@@ -30,12 +34,11 @@ class NotificationService:
     ) -> NotificationResponse:
         """Create a notification and broadcast it via WebSocket"""
         try:
-            db = get_database()
-            
             # Create notification document
             notification_data = {
                 "user_id": ObjectId(user_id),
                 "notification_type": notification_type.value,
+                "type": FRONTEND_NOTIFICATION_TYPES.get(notification_type.value, "urgent"),
                 "title": title,
                 "message": message,
                 "data": data or {},
@@ -46,16 +49,15 @@ class NotificationService:
                 "created_at": datetime.utcnow()
             }
             
-            # Insert notification
-            result = await db.notifications.insert_one(notification_data)
-            created_notification = await db.notifications.find_one({"_id": result.inserted_id})
+            # Insert notification, grouped with concurrent inserts
+            notification_id = await insert_batcher.insert("notifications", notification_data)
             
             # Convert ObjectIds to strings for proper serialization
-            notification_for_response = created_notification.copy()
-            notification_for_response["_id"] = str(created_notification["_id"])
-            notification_for_response["user_id"] = str(created_notification["user_id"])
+            notification_for_response = notification_data.copy()
+            notification_for_response["_id"] = str(notification_data["_id"])
+            notification_for_response["user_id"] = str(notification_data["user_id"])
             if notification_for_response.get("ticket_id"):
-                notification_for_response["ticket_id"] = str(created_notification["ticket_id"])
+                notification_for_response["ticket_id"] = str(notification_data["ticket_id"])
             
             # Prepare notification response
             notification_response = NotificationResponse(**notification_for_response)
@@ -75,7 +77,7 @@ class NotificationService:
             else:
                 logger.info(f"User {user_id} not connected, notification saved to database only")
             
-            logger.info(f"Created and broadcast notification {result.inserted_id} to user {user_id}")
+            logger.info(f"Created and broadcast notification {notification_id} to user {user_id}")
             return notification_response
             
         except Exception as e:
@@ -96,7 +98,7 @@ class NotificationService:
             db = get_database()
             
             # Get ticket details
-            ticket = await db.tickets.find_one({"_id": ObjectId(ticket_id)})
+            ticket = await get_loaders().tickets.load(ticket_id)
             if not ticket:
                 logger.error(f"Ticket {ticket_id} not found")
                 return
@@ -109,7 +111,7 @@ class NotificationService:
                 admin_users = await db.users.find({
                     "role": {"$in": ["admin", "agent"]},
                     "is_active": True
-                }).to_list(None)
+                }, {"_id": 1}).to_list(None)
                 users_to_notify.extend([str(user["_id"]) for user in admin_users])
             
             if target_user_id:
@@ -160,14 +162,7 @@ class NotificationService:
             # Get ticket details with creator info
             pipeline = [
                 {"$match": {"_id": ObjectId(ticket_id)}},
-                {
-                    "$lookup": {
-                        "from": "users",
-                        "localField": "created_by",
-                        "foreignField": "_id",
-                        "as": "creator"
-                    }
-                }
+                user_lookup("created_by", "creator", USER_CONTACT_PROJECTION)
             ]
             
             ticket_cursor = db.tickets.aggregate(pipeline)
@@ -215,12 +210,13 @@ class NotificationService:
     async def notify_ticket_assignment(ticket_id: str, assigned_to_id: str, assigned_by_id: str):
         """Notify about ticket assignment"""
         try:
-            db = get_database()
-            
-            # Get assignee and assigner details
-            assignee = await db.users.find_one({"_id": ObjectId(assigned_to_id)})
-            assigner = await db.users.find_one({"_id": ObjectId(assigned_by_id)})
-            ticket = await db.tickets.find_one({"_id": ObjectId(ticket_id)})
+            # Get assignee, assigner and ticket details (users in one batched query)
+            loaders = get_loaders()
+            assignee, assigner, ticket = await asyncio.gather(
+                loaders.users.load(assigned_to_id),
+                loaders.users.load(assigned_by_id),
+                loaders.tickets.load(ticket_id)
+            )
             
             if not all([assignee, assigner, ticket]):
                 logger.error("Missing data for ticket assignment notification")
@@ -255,10 +251,11 @@ class NotificationService:
     async def notify_ticket_status_change(ticket_id: str, old_status: str, new_status: str, updated_by_id: str):
         """Notify about ticket status changes"""
         try:
-            db = get_database()
-            
-            ticket = await db.tickets.find_one({"_id": ObjectId(ticket_id)})
-            updated_by = await db.users.find_one({"_id": ObjectId(updated_by_id)})
+            loaders = get_loaders()
+            ticket, updated_by = await asyncio.gather(
+                loaders.tickets.load(ticket_id),
+                loaders.users.load(updated_by_id)
+            )
             
             if not all([ticket, updated_by]):
                 logger.error("Missing data for ticket status change notification")
@@ -316,10 +313,11 @@ class NotificationService:
     async def notify_ticket_resolved(ticket_id: str, resolved_by_id: str, resolution_note: Optional[str] = None):
         """Notify about ticket resolution"""
         try:
-            db = get_database()
-            
-            ticket = await db.tickets.find_one({"_id": ObjectId(ticket_id)})
-            resolved_by = await db.users.find_one({"_id": ObjectId(resolved_by_id)})
+            loaders = get_loaders()
+            ticket, resolved_by = await asyncio.gather(
+                loaders.tickets.load(ticket_id),
+                loaders.users.load(resolved_by_id)
+            )
             
             if not all([ticket, resolved_by]):
                 logger.error("Missing data for ticket resolution notification")
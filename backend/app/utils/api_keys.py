@@ -0,0 +1,175 @@
+"""
+Service API key issuing and verification
+Keys are stored as keyed SHA-256 digests and checked against an in-memory index that is
+kept current by api_keys change events, and reloaded periodically in case change streams
+are unavailable, so keys issued or revoked on other workers are picked up
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import secrets
+from typing import Dict, Optional, Tuple, Union
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from app.config import settings
+from app.database.change_streams import ChangeEvent, change_stream
+from app.database.connection import get_database
+from app.models.user import AuthPrincipal
+
+logger = logging.getLogger(__name__)
+
+API_KEY_PREFIX = "hdk_"
+# Leading characters of a key stored in the clear to identify it
+KEY_PREFIX_LENGTH = 8
+
+
+def generate_api_key() -> str:
+    """Generate a new random API key"""
+    return f"{API_KEY_PREFIX}{secrets.token_urlsafe(32)}"
+
+
+def api_key_prefix(key: str) -> str:
+    """Get the public part of an API key used to find its digest"""
+    return key[:KEY_PREFIX_LENGTH]
+
+
+def hash_api_key(key: str) -> str:
+    """Compute the keyed digest stored for an API key"""
+    return hmac.new(settings.secret_key.encode(), key.encode(), hashlib.sha256).hexdigest()
+
+
+class ApiKeyIndex:
+    """In-memory index of active API keys by their public prefix"""
+    
+    def __init__(self, reload_seconds: float):
+        self.reload_seconds = reload_seconds
+        # key prefix -> {key id: (digest, principal)}
+        self._keys: Dict[str, Dict[str, Tuple[str, AuthPrincipal]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.reloads = 0
+        self.reload_errors = 0
+    
+    async def _principal_for(self, user_id: ObjectId) -> Optional[AuthPrincipal]:
+        db = get_database()
+        user = await db.users.find_one({"_id": user_id}, {"email": 1, "role": 1, "status": 1})
+        if not user:
+            return None
+        return AuthPrincipal(id=user["_id"], email=user.get("email"), role=user["role"], status=user["status"])
+    
+    async def load(self) -> None:
+        """Load every non-revoked key together with its owner's role and status"""
+        db = get_database()
+        keys: Dict[str, Dict[str, Tuple[str, AuthPrincipal]]] = {}
+        principals: Dict[ObjectId, Optional[AuthPrincipal]] = {}
+        async for api_key in db.api_keys.find({"revoked_at": None}):
+            user_id = api_key["user_id"]
+            if user_id not in principals:
+                principals[user_id] = await self._principal_for(user_id)
+            if principals[user_id] is not None:
+                keys.setdefault(api_key["key_prefix"], {})[str(api_key["_id"])] = (api_key["key_digest"], principals[user_id])
+        self._keys = keys
+        self.reloads += 1
+        logger.debug(f"Loaded {len(self)} API keys")
+    
+    async def _run(self) -> None:
+        """Reload periodically until cancelled"""
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+            try:
+                await self.load()
+            except PyMongoError as e:
+                self.reload_errors += 1
+                logger.warning(f"⚠️ Could not reload API keys: {e}")
+    
+    def start(self) -> None:
+        """Start the periodic reload task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        """Stop the periodic reload task"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def add(self, key_id: Union[str, ObjectId], key_prefix: str, key_digest: str, principal: AuthPrincipal) -> None:
+        """Register a newly issued key"""
+        self._keys.setdefault(key_prefix, {})[str(key_id)] = (key_digest, principal)
+    
+    async def refresh_key(self, key_id: Union[str, ObjectId]) -> None:
+        """Re-read one key, adding it if active and forgetting it if revoked or deleted"""
+        db = get_database()
+        api_key = await db.api_keys.find_one({"_id": ObjectId(key_id)})
+        principal = None
+        if api_key is not None and api_key.get("revoked_at") is None:
+            principal = await self._principal_for(api_key["user_id"])
+        self.remove(key_id)
+        if principal is not None:
+            self.add(key_id, api_key["key_prefix"], api_key["key_digest"], principal)
+    
+    def remove(self, key_id: Union[str, ObjectId]) -> None:
+        """Forget a revoked key"""
+        key_id = str(key_id)
+        for key_prefix in [p for p, group in self._keys.items() if key_id in group]:
+            del self._keys[key_prefix][key_id]
+            if not self._keys[key_prefix]:
+                del self._keys[key_prefix]
+    
+    async def reload_user(self, user_id: Union[str, ObjectId]) -> None:
+        """Refresh the role and status of every key owned by a user after it changes"""
+        owned = [
+            (key_prefix, key_id)
+            for key_prefix, group in self._keys.items()
+            for key_id, (_, principal) in group.items()
+            if str(principal.id) == str(user_id)
+        ]
+        if not owned:
+            return
+        principal = await self._principal_for(ObjectId(user_id))
+        for key_prefix, key_id in owned:
+            if principal is None:
+                self.remove(key_id)
+            else:
+                self._keys[key_prefix][key_id] = (self._keys[key_prefix][key_id][0], principal)
+    
+    def authenticate(self, key: str) -> Optional[AuthPrincipal]:
+        """Resolve an API key to its principal without touching the database"""
+        if not key.startswith(API_KEY_PREFIX):
+            return None
+        key_digest = hash_api_key(key)
+        # The prefix is public; the digest is compared in constant time
+        for stored_digest, principal in self._keys.get(api_key_prefix(key), {}).values():
+            if hmac.compare_digest(stored_digest, key_digest):
+                return principal
+        return None
+    
+    def __len__(self) -> int:
+        return sum(len(group) for group in self._keys.values())
+    
+    def stats(self) -> Dict[str, int]:
+        """Get index size and reload counters"""
+        return {"active": len(self), "reloads": self.reloads, "reload_errors": self.reload_errors}
+
+
+# Create global API key index
+api_key_index = ApiKeyIndex(reload_seconds=settings.api_key_reload_seconds)
+
+
+async def _api_key_changed(event: ChangeEvent) -> None:
+    """Apply keys issued or revoked by any worker to the index"""
+    if event.document_id is None:
+        await api_key_index.load()
+    elif event.operation == "delete":
+        api_key_index.remove(event.document_id)
+    else:
+        await api_key_index.refresh_key(event.document_id)
+
+
+change_stream.subscribe("api_keys", _api_key_changed)
@@ -2,25 +2,91 @@
 Authentication utilities for JWT tokens and password security
 """
 
+import asyncio
+import hashlib
 import secrets
+import time
 from datetime import datetime, timedelta
 from typing import Optional, Union
 from fastapi import HTTPException, Depends, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, APIKeyHeader
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from bson import ObjectId
 
 from app.config import settings
+from app.database.change_streams import ChangeEvent, change_stream
 from app.database.connection import get_database
-from app.models.user import TokenData, UserResponse, UserRole
+from app.database.loaders import get_loaders
+from app.models.user import TokenData, UserResponse, UserRole, UserStatus, AuthPrincipal
+from app.models.projections import USER_RESPONSE_PROJECTION
+from app.services.activity_service import last_login_tracker
+from app.utils.api_keys import API_KEY_PREFIX, api_key_index
+from app.utils.auth_epochs import auth_epochs
+from app.utils.cache import TTLCache, VersionedCache
+from app.utils.password_hashing import BCRYPT_MAX_ROUNDS, PasswordHashingPool, calibrate_bcrypt_rounds
 
 # Password hashing context
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+
+def configure_bcrypt_rounds(rounds: int, min_rounds: int) -> None:
+    """Use a bcrypt cost for new hashes and flag only hashes below min_rounds for rehashing"""
+    # A band rather than an exact cost, so nodes that calibrate differently
+    # do not rewrite each other's hashes on every login
+    pwd_context.update(
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=min(min_rounds, rounds),
+        bcrypt__max_rounds=BCRYPT_MAX_ROUNDS
+    )
+
+
+async def calibrate_password_hashing() -> int:
+    """Benchmark bcrypt on this host and configure the cost that meets the target verify time"""
+    loop = asyncio.get_running_loop()
+    rounds = await loop.run_in_executor(
+        None, calibrate_bcrypt_rounds, settings.bcrypt_target_ms, settings.bcrypt_min_rounds
+    )
+    configure_bcrypt_rounds(rounds, settings.bcrypt_min_rounds)
+    return rounds
+
+
+if settings.bcrypt_rounds is not None:
+    # One cost shared by every node, so hashes below it can safely be upgraded
+    configure_bcrypt_rounds(settings.bcrypt_rounds, settings.bcrypt_rounds)
+
+# Bounded worker pool so bcrypt never runs on the event loop
+password_hashing_pool = PasswordHashingPool(
+    max_workers=settings.password_hash_workers,
+    max_queue_size=settings.password_hash_queue_size,
+    queue_timeout_seconds=settings.password_hash_queue_timeout_seconds
+)
+
 # HTTP Bearer token security
 security = HTTPBearer()
 
+# Optional credentials for endpoints that also accept service API keys
+optional_security = HTTPBearer(auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+# Authenticated user cache keyed by user ID; versioned so a load racing with
+# a suspension or role change cannot put the old user back
+user_cache = VersionedCache(
+    max_size=settings.user_cache_max_size,
+    ttl_seconds=settings.user_cache_ttl_seconds
+)
+
+# Verified JWT claims keyed by token digest, never kept past the token's exp
+token_cache = TTLCache(
+    max_size=settings.token_cache_max_size,
+    ttl_seconds=settings.token_cache_ttl_seconds
+)
+
+
+def invalidate_user_cache(user_id: Union[str, ObjectId]) -> None:
+    """Drop a user from the authenticated user cache after it changes"""
+    user_cache.bump(str(user_id))
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash"""
@@ -32,10 +98,33 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    """Create a JWT access token"""
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool without blocking the event loop"""
+    return await password_hashing_pool.run(verify_password, plain_password, hashed_password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Check whether a stored hash is below the configured minimum cost"""
+    return pwd_context.needs_update(hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool without blocking the event loop"""
+    return await password_hashing_pool.run(get_password_hash, password)
+
+
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, user: Optional[dict] = None) -> str:
+    """Create a JWT access token, embedding authorization claims for user when stateless auth is enabled"""
     to_encode = data.copy()
     
+    if user is not None and settings.stateless_auth_enabled:
+        user_id = str(user["_id"])
+        to_encode.update({
+            "role": user.get("role"),
+            "status": user.get("status"),
+            "epoch": max(user.get("auth_epoch", 0), auth_epochs.get(user_id))
+        })
+    
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -47,10 +136,44 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def decode_access_token(token: str) -> dict:
+    """Decode and verify a JWT, reusing cached claims for recently verified tokens"""
+    digest = _token_digest(token)
+    payload = token_cache.get(digest)
+    if payload is not None:
+        # The cache TTL is capped at exp, but guard against clock edge cases
+        if payload.get("exp", 0) > time.time():
+            return payload
+        token_cache.invalidate(digest)
+    
+    payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    
+    expires_in = payload.get("exp", 0) - time.time()
+    if expires_in > 0:
+        token_cache.set(digest, payload, ttl_seconds=expires_in)
+    
+    return payload
+
+
+def purge_token_cache(token: Optional[str] = None, user_id: Optional[Union[str, ObjectId]] = None) -> int:
+    """Drop cached claims for a token or for every token of a user so revocation applies immediately"""
+    if token is not None:
+        token_cache.invalidate(_token_digest(token))
+        return 1
+    if user_id is not None:
+        return token_cache.invalidate_where(lambda _, payload: payload.get("sub") == str(user_id))
+    token_cache.clear()
+    return 0
+
+
 def verify_token(token: str) -> TokenData:
     """Verify and decode a JWT token"""
     try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = decode_access_token(token)
         user_id: str = payload.get("sub")
         email: str = payload.get("email")
         
@@ -78,22 +201,26 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     token_data = verify_token(token)
     
     db = get_database()
-    user = await db.users.find_one({"_id": ObjectId(token_data.user_id)})
+    current_user = user_cache.get(token_data.user_id)
     
-    if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    if current_user is None:
+        version = user_cache.version(token_data.user_id)
+        user = await db.users.find_one({"_id": ObjectId(token_data.user_id)}, USER_RESPONSE_PROJECTION)
+        
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
+        current_user = UserResponse(**user)
+        user_cache.set(token_data.user_id, version, current_user)
     
-    # Update last login time
-    await db.users.update_one(
-        {"_id": ObjectId(token_data.user_id)},
-        {"$set": {"last_login": datetime.utcnow()}}
-    )
+    # Record activity; last_login is written behind in periodic bulk writes
+    last_login_tracker.record(token_data.user_id, stored=current_user.last_login)
     
-    return UserResponse(**user)
+    return current_user
 
 
 async def get_current_active_user(current_user: UserResponse = Depends(get_current_user)) -> UserResponse:
@@ -132,6 +259,135 @@ async def get_agent_or_admin_user(current_user: UserResponse = Depends(require_r
     return current_user
 
 
+def _revoked_token() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Token has been revoked",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_current_principal(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    api_key: Optional[str] = Depends(api_key_header)
+) -> AuthPrincipal:
+    """Get the caller's identity from an API key, or from token claims when stateless auth is enabled"""
+    if api_key is None and credentials is not None and credentials.credentials.startswith(API_KEY_PREFIX):
+        api_key = credentials.credentials
+    
+    if api_key is not None:
+        principal = api_key_index.authenticate(api_key)
+        if principal is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid API key"
+            )
+        return principal
+    
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authenticated"
+        )
+    
+    if settings.stateless_auth_enabled:
+        try:
+            payload = decode_access_token(credentials.credentials)
+        except JWTError:
+            payload = {}
+        
+        user_id = payload.get("sub")
+        if user_id and "role" in payload and "epoch" in payload:
+            if not auth_epochs.is_current(user_id, payload["epoch"]):
+                raise _revoked_token()
+            return AuthPrincipal(
+                id=user_id,
+                email=payload.get("email"),
+                role=payload["role"],
+                status=payload.get("status", UserStatus.ACTIVE)
+            )
+    
+    current_user = await get_current_user(credentials)
+    return AuthPrincipal(
+        id=current_user.id,
+        email=current_user.email,
+        role=current_user.role,
+        status=current_user.status
+    )
+
+
+async def get_current_active_principal(principal: AuthPrincipal = Depends(get_current_principal)) -> AuthPrincipal:
+    """Get the caller's identity, requiring an active account"""
+    if principal.status != UserStatus.ACTIVE:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User account is not active"
+        )
+    return principal
+
+
+def require_role_principal(required_roles: Union[UserRole, list[UserRole]]):
+    """Dependency factory requiring specific roles, without loading the user document when possible"""
+    if isinstance(required_roles, UserRole):
+        required_roles = [required_roles]
+    
+    def role_checker(principal: AuthPrincipal = Depends(get_current_active_principal)) -> AuthPrincipal:
+        if principal.role not in required_roles:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Insufficient permissions"
+            )
+        return principal
+    
+    return role_checker
+
+
+async def get_admin_principal(principal: AuthPrincipal = Depends(require_role_principal(UserRole.ADMIN))) -> AuthPrincipal:
+    """Get caller identity with admin role"""
+    return principal
+
+
+async def get_agent_or_admin_principal(principal: AuthPrincipal = Depends(require_role_principal([UserRole.AGENT, UserRole.ADMIN]))) -> AuthPrincipal:
+    """Get caller identity with agent or admin role"""
+    return principal
+
+
+async def revoke_user_tokens(user_id: Union[str, ObjectId]) -> None:
+    """Invalidate cached state for a user, bump their revocation epoch and refresh their API keys"""
+    invalidate_user_cache(user_id)
+    purge_token_cache(user_id=user_id)
+    await auth_epochs.bump(user_id)
+    await api_key_index.reload_user(user_id)
+
+
+# User fields that tokens and API key principals depend on
+AUTH_FIELDS = {"email", "role", "status", "auth_epoch"}
+
+
+async def _user_changed(event: ChangeEvent) -> None:
+    """Apply user writes made by any worker to the caches derived from users"""
+    if event.document_id is None:
+        user_cache.clear()
+        token_cache.clear()
+        if settings.stateless_auth_enabled:
+            await auth_epochs.load()
+        await api_key_index.load()
+        return
+    
+    invalidate_user_cache(event.document_id)
+    changed_fields = set(event.updated_fields) | set(event.removed_fields)
+    if event.operation == "update" and not AUTH_FIELDS & changed_fields:
+        return  # Profile or activity change; nothing token-related moved
+    
+    purge_token_cache(user_id=event.document_id)
+    if "auth_epoch" in event.updated_fields:
+        auth_epochs.set(event.document_id, event.updated_fields["auth_epoch"])
+    await api_key_index.reload_user(event.document_id)
+
+
+change_stream.subscribe("users", _user_changed)
+
+
 def generate_secure_filename(filename: str) -> str:
     """Generate a secure filename with random prefix"""
     secure_random = secrets.token_hex(16)
@@ -149,10 +405,9 @@ def validate_file_type(content_type: str) -> bool:
     return content_type in settings.allowed_file_types
 
 
-async def check_ticket_permissions(ticket_id: str, current_user: UserResponse) -> bool:
+async def check_ticket_permissions(ticket_id: str, current_user: Union[UserResponse, AuthPrincipal]) -> bool:
     """Check if user has permission to access a ticket"""
-    db = get_database()
-    ticket = await db.tickets.find_one({"_id": ObjectId(ticket_id)})
+    ticket = await get_loaders().tickets.load(ticket_id)
     
     if not ticket:
         return False
@@ -0,0 +1,60 @@
+"""
+Per-user revocation epochs for stateless token authorization
+"""
+
+import logging
+from typing import Dict, Union
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from app.database.connection import get_database
+
+logger = logging.getLogger(__name__)
+
+
+class AuthEpochTable:
+    """In-memory table of user revocation epochs backed by users.auth_epoch"""
+    
+    def __init__(self):
+        self._epochs: Dict[str, int] = {}
+    
+    async def load(self) -> None:
+        """Load every non-zero epoch; users without one are at epoch 0"""
+        db = get_database()
+        cursor = db.users.find({"auth_epoch": {"$gt": 0}}, {"auth_epoch": 1})
+        epochs = {}
+        async for user in cursor:
+            epochs[str(user["_id"])] = user["auth_epoch"]
+        self._epochs = epochs
+        logger.info(f"Loaded {len(epochs)} auth epochs")
+    
+    def get(self, user_id: Union[str, ObjectId]) -> int:
+        """Get the current epoch for a user"""
+        return self._epochs.get(str(user_id), 0)
+    
+    def set(self, user_id: Union[str, ObjectId], epoch: int) -> None:
+        """Record an epoch observed elsewhere, never moving backwards"""
+        user_id = str(user_id)
+        if epoch > self._epochs.get(user_id, 0):
+            self._epochs[user_id] = epoch
+    
+    def is_current(self, user_id: Union[str, ObjectId], epoch: int) -> bool:
+        """Check whether a token epoch is still valid for a user"""
+        return epoch >= self.get(user_id)
+    
+    async def bump(self, user_id: Union[str, ObjectId]) -> int:
+        """Increment a user's epoch so every token issued before now is rejected"""
+        db = get_database()
+        user = await db.users.find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {"auth_epoch": 1}},
+            projection={"auth_epoch": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        epoch = user["auth_epoch"] if user else self.get(user_id) + 1
+        self.set(user_id, epoch)
+        return epoch
+
+
+# Create global epoch table
+auth_epochs = AuthEpochTable()
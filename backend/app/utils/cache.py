@@ -0,0 +1,138 @@
+"""
+In-process caching utilities
+"""
+
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Bounded LRU cache with per-entry expiry and hit/miss counters"""
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value, evicting the least recently used entry when full"""
+        if self.max_size <= 0:
+            return
+        
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl <= 0:
+            return
+        
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry"""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Drop every entry matching predicate(key, value) and return the count"""
+        with self._lock:
+            stale = [key for key, (_, value) in self._entries.items() if predicate(key, value)]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+    
+    def clear(self) -> None:
+        """Drop all entries"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class VersionedCache:
+    """TTL cache whose entries are only served while their version is current"""
+    
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self._entries = TTLCache(max_size, ttl_seconds)
+        # Versions are unique values from one counter, so a version evicted
+        # and restarted at 0 can never match a stale entry
+        self._versions = TTLCache(max_size * 2, ttl_seconds * 4)
+        self._counter = itertools.count(1)
+        # Version of every key not written since the last clear()
+        self._floor = 0
+        self.stale = 0
+    
+    def version(self, key: Hashable) -> int:
+        """Current version of a key, captured before loading it"""
+        return self._versions.get(key) or self._floor
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value if its version is still current"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        version, value = entry
+        if version != self.version(key):
+            self.stale += 1
+            self._entries.invalidate(key)
+            return None
+        return value
+    
+    def set(self, key: Hashable, version: int, value: Any) -> None:
+        """Store a value loaded while the key was at version"""
+        # A load that raced with a write captured the old version and is dropped here
+        if version == self.version(key):
+            self._entries.set(key, (version, value))
+    
+    def bump(self, key: Hashable) -> None:
+        """Mark a key as written"""
+        self._versions.set(key, next(self._counter))
+        self._entries.invalidate(key)
+    
+    def clear(self) -> None:
+        """Mark every key as written"""
+        self._floor = next(self._counter)
+        self._versions.clear()
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get cache counters"""
+        return {**self._entries.stats(), "stale": self.stale}
@@ -0,0 +1,141 @@
+"""
+Sliding-window login throttling and lockout
+Each attempt is reserved before any password hashing work is done, so concurrent
+guesses cannot all pass the limit; successful logins give their reservation back
+"""
+
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.database.connection import get_database
+
+
+class MemoryAttemptStore:
+    """Per-process failed attempt timestamps"""
+    
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._attempts: Dict[str, Deque[float]] = {}
+    
+    def _window(self, key: str, window_seconds: float) -> Optional[Deque[float]]:
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            return None
+        cutoff = time.time() - window_seconds
+        while attempts and attempts[0] <= cutoff:
+            attempts.popleft()
+        if not attempts:
+            del self._attempts[key]
+            return None
+        return attempts
+    
+    async def reserve(self, key: str, limit: int, window_seconds: float) -> Tuple[Any, Optional[float]]:
+        # No await between the check and the append, so this is atomic within the process
+        attempts = self._window(key, window_seconds)
+        if attempts is not None and len(attempts) >= limit:
+            return None, attempts[-limit] + window_seconds - time.time()
+        if len(self._attempts) >= self.max_keys:
+            # Drop keys whose attempts have all left the window
+            for stale_key in list(self._attempts):
+                self._window(stale_key, window_seconds)
+        attempted_at = time.time()
+        self._attempts.setdefault(key, deque()).append(attempted_at)
+        return attempted_at, None
+    
+    async def release(self, key: str, attempt_id: Any) -> None:
+        attempts = self._attempts.get(key)
+        if attempts is not None and attempt_id in attempts:
+            attempts.remove(attempt_id)
+    
+    async def clear(self, key: str) -> None:
+        self._attempts.pop(key, None)
+
+
+class MongoAttemptStore:
+    """Failed attempts persisted in the login_attempts collection, shared by all workers"""
+    
+    async def reserve(self, key: str, limit: int, window_seconds: float) -> Tuple[Any, Optional[float]]:
+        db = get_database()
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=window_seconds)
+        # Insert first, then count: of any limit+1 concurrent attempts the last insert
+        # sees all of them, so more than limit can never be admitted
+        result = await db.login_attempts.insert_one({
+            "key": key,
+            "attempted_at": now,
+            "expires_at": now + timedelta(seconds=window_seconds)
+        })
+        attempts = await db.login_attempts.find(
+            {"key": key, "attempted_at": {"$gt": cutoff}, "_id": {"$ne": result.inserted_id}},
+            {"attempted_at": 1}
+        ).sort("attempted_at", -1).limit(limit).to_list(limit)
+        if len(attempts) < limit:
+            return result.inserted_id, None
+        
+        await db.login_attempts.delete_one({"_id": result.inserted_id})
+        oldest = attempts[-1]["attempted_at"]
+        return None, (oldest + timedelta(seconds=window_seconds) - now).total_seconds()
+    
+    async def release(self, key: str, attempt_id: Any) -> None:
+        db = get_database()
+        await db.login_attempts.delete_one({"_id": attempt_id})
+    
+    async def clear(self, key: str) -> None:
+        db = get_database()
+        await db.login_attempts.delete_many({"key": key})
+
+
+class LoginThrottle:
+    """Limit failed logins per email and per client IP within a sliding window"""
+    
+    def __init__(self, store, max_attempts_per_email: int, max_attempts_per_ip: int, window_minutes: int):
+        self.store = store
+        self.max_attempts_per_email = max_attempts_per_email
+        self.max_attempts_per_ip = max_attempts_per_ip
+        self.window_seconds = window_minutes * 60
+        self.rejected = 0
+    
+    def _keys(self, email: str, client_ip: Optional[str]) -> List[tuple]:
+        keys = [(f"email:{email.lower()}", self.max_attempts_per_email)]
+        if client_ip:
+            keys.append((f"ip:{client_ip}", self.max_attempts_per_ip))
+        return keys
+    
+    async def reserve(self, email: str, client_ip: Optional[str]) -> List[tuple]:
+        """Count an attempt against the email and client IP, raising 429 if either is locked out"""
+        reservations = []
+        for key, limit in self._keys(email, client_ip):
+            attempt_id, retry_after = await self.store.reserve(key, limit, self.window_seconds)
+            if attempt_id is None:
+                await self.release(reservations)
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many failed login attempts, please try again later",
+                    headers={"Retry-After": str(max(int(retry_after), 0) + 1)}
+                )
+            reservations.append((key, attempt_id))
+        return reservations
+    
+    async def release(self, reservations: List[tuple]) -> None:
+        """Give back attempts that did not turn out to be failed logins"""
+        for key, attempt_id in reservations:
+            await self.store.release(key, attempt_id)
+    
+    async def record_success(self, email: str, reservations: List[tuple]) -> None:
+        """Reset the email counter and give back the attempt after a successful login"""
+        await self.release(reservations)
+        await self.store.clear(f"email:{email.lower()}")
+
+
+# Create login throttle instance
+login_throttle = LoginThrottle(
+    store=MongoAttemptStore() if settings.login_throttle_backend == "mongo" else MemoryAttemptStore(),
+    max_attempts_per_email=settings.max_login_attempts,
+    max_attempts_per_ip=settings.max_login_attempts_per_ip,
+    window_minutes=settings.lockout_duration_minutes
+)
@@ -0,0 +1,117 @@
+"""
+Bounded worker pool and cost calibration for bcrypt password hashing
+Keeps CPU-heavy hashing off the event loop and sheds load when saturated
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from fastapi import HTTPException, status
+from passlib.hash import bcrypt
+
+# bcrypt cost is a log2 work factor; the algorithm accepts 4-31
+BCRYPT_MAX_ROUNDS = 31
+CALIBRATION_ROUNDS = 8
+
+
+def measure_bcrypt_verify_ms(rounds: int, samples: int = 3) -> float:
+    """Measure the fastest of several bcrypt verifications at a given cost"""
+    hashed = bcrypt.using(rounds=rounds).hash("calibration-password")
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.verify("calibration-password", hashed)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def calibrate_bcrypt_rounds(target_ms: float, min_rounds: int) -> int:
+    """Pick the highest bcrypt cost whose verify time on this host stays within target_ms"""
+    base_ms = measure_bcrypt_verify_ms(CALIBRATION_ROUNDS)
+    if target_ms <= 0 or base_ms <= 0:
+        # Nothing to scale from; never guess upward, a cost near the maximum takes days
+        return min_rounds
+    # Each extra round doubles the work
+    rounds = CALIBRATION_ROUNDS + int(math.floor(math.log2(target_ms / base_ms)))
+    return max(min_rounds, min(rounds, BCRYPT_MAX_ROUNDS))
+
+
+class PasswordHashingPool:
+    """Size-limited executor with a bounded wait queue for password hashing"""
+    
+    def __init__(self, max_workers: int, max_queue_size: int, queue_timeout_seconds: float):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._slots = asyncio.Semaphore(max_workers)
+        self._waiting = 0
+        self._running = 0
+        self._latencies_ms: deque = deque(maxlen=1000)
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+    
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy, please retry",
+            headers={"Retry-After": "1"}
+        )
+    
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a hashing function on the pool, failing fast with 503 when saturated"""
+        if not self._slots.locked():
+            await self._slots.acquire()
+        elif self._waiting >= self.max_queue_size:
+            self.rejected += 1
+            raise self._busy()
+        else:
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout_seconds)
+            except asyncio.TimeoutError:
+                self.timed_out += 1
+                raise self._busy()
+            finally:
+                self._waiting -= 1
+        
+        self._running += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._running -= 1
+            self._slots.release()
+            self._latencies_ms.append((time.perf_counter() - started) * 1000)
+            self.completed += 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get queue depth and hash latency metrics"""
+        latencies = sorted(self._latencies_ms)
+        
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 2)
+        
+        return {
+            "max_workers": self.max_workers,
+            "max_queue_size": self.max_queue_size,
+            "queue_depth": self._waiting,
+            "running": self._running,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "latency_ms_p50": percentile(0.50),
+            "latency_ms_p95": percentile(0.95),
+            "latency_ms_max": round(latencies[-1], 2) if latencies else 0.0
+        }
+    
+    def shutdown(self) -> None:
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=False)
@@ -6,13 +6,14 @@ import json
 import logging
 from datetime import datetime
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
-from jose import JWTError, jwt
+from jose import JWTError
 from bson import ObjectId
 
-from app.config import settings
 from app.models.user import UserResponse, UserRole
+from app.models.projections import USER_RESPONSE_PROJECTION
 from app.websocket.manager import manager
 from app.database.connection import get_database
+from app.utils.auth import decode_access_token
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +29,7 @@ async def get_current_user_websocket(token: str) -> UserResponse:
             raise HTTPException(status_code=401, detail="Invalid token format")
         
         # Decode JWT token
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+        payload = decode_access_token(token)
         user_id: str = payload.get("sub")
         
         if user_id is None:
@@ -40,7 +41,7 @@ async def get_current_user_websocket(token: str) -> UserResponse:
         
         # User ID in JWT token is already a string representation of ObjectId
         try:
-            user = await db.users.find_one({"_id": ObjectId(user_id)})
+            user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_RESPONSE_PROJECTION)
         except Exception as e:
             logger.error(f"Error finding user {user_id}: {e}")
             user = None
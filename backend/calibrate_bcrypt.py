@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Benchmark bcrypt on this host and recommend a BCRYPT_ROUNDS value
+"""
+
+import argparse
+
+from app.config import settings
+from app.utils.password_hashing import calibrate_bcrypt_rounds, measure_bcrypt_verify_ms
+
+
+def main():
+    """Run the bcrypt calibration"""
+    parser = argparse.ArgumentParser(description="Calibrate bcrypt cost for this host")
+    parser.add_argument("--target-ms", type=float, default=settings.bcrypt_target_ms, help="Target verify time in milliseconds")
+    parser.add_argument("--min-rounds", type=int, default=settings.bcrypt_min_rounds, help="Lowest acceptable cost")
+    args = parser.parse_args()
+    
+    print(f"⏱️  Calibrating bcrypt for a {args.target_ms:.0f} ms verify target...")
+    rounds = calibrate_bcrypt_rounds(args.target_ms, args.min_rounds)
+    measured = measure_bcrypt_verify_ms(rounds)
+    
+    print(f"✅ Recommended cost: {rounds} rounds ({measured:.1f} ms per verify on this host)")
+    print(f"   Set BCRYPT_ROUNDS={rounds} in the environment to use it")
+    print("   Existing hashes are upgraded transparently on each user's next login")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,11 +7,22 @@ import uvicorn
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, JSONResponse
 from contextlib import asynccontextmanager
+from datetime import datetime
 
 from app.config import settings
-from app.database.connection import init_database, close_database
+from app.database.connection import db, init_database, close_database, get_database
+from app.database.change_streams import change_stream
+from app.database.counters import counter_buffer
+from app.database.inserts import insert_batcher
+from app.database.loaders import RequestLoaderMiddleware
+from app.database.monitoring import DbTimingMiddleware, pool_monitor
+from app.database.slow_queries import slow_query_log
+from app.services.activity_service import last_login_tracker
+from app.utils.auth import password_hashing_pool, calibrate_password_hashing
+from app.utils.auth_epochs import auth_epochs
+from app.utils.api_keys import api_key_index
 from app.routes import auth, tickets, users, chat, notifications, admin
 from app.websocket import routes as websocket_routes
 
@@ -20,6 +31,19 @@ async def lifespan(app: FastAPI):
     """Handle application startup and shutdown events"""
     # Startup
     await init_database()
+    if settings.change_streams_enabled:
+        # Opened before the caches below load so no write between the two is missed
+        await change_stream.start(get_database())
+    if settings.bcrypt_rounds is None and settings.bcrypt_calibrate_on_startup:
+        rounds = await calibrate_password_hashing()
+        print(f"🔐 Calibrated bcrypt cost: {rounds} rounds")
+    if settings.stateless_auth_enabled:
+        await auth_epochs.load()
+    await api_key_index.load()
+    api_key_index.start()
+    last_login_tracker.start()
+    counter_buffer.start()
+    await slow_query_log.start(get_database())
     print("🚀 Help Desk API started successfully!")
     print(f"📚 Database: {settings.database_name}")
     print(f"🌐 Server: http://{settings.host}:{settings.port}")
@@ -27,7 +51,14 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    await api_key_index.stop()
+    await last_login_tracker.stop()
+    await insert_batcher.stop()
+    await counter_buffer.stop()
+    await slow_query_log.stop()
+    await change_stream.stop()
     await close_database()
+    password_hashing_pool.shutdown()
     print("👋 Help Desk API shutdown complete!")
 
 # Initialize FastAPI app
@@ -51,6 +82,13 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# Give every request its own batching loaders for users and tickets
+app.add_middleware(RequestLoaderMiddleware)
+
+# Report per-request MongoDB time in a Server-Timing header
+if settings.db_command_monitoring_enabled:
+    app.add_middleware(DbTimingMiddleware)
+
 # Mount static files
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
@@ -82,7 +120,38 @@ async def root():
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": "2024-01-01T00:00:00Z"}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "indexes": db.index_status.to_dict()
+    }
+
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness check: live database ping and connection pool saturation"""
+    ready = True
+    database = {"reachable": True, "ping_ms": None, "error": None}
+    try:
+        database["ping_ms"] = round(await db.ping(settings.readiness_ping_timeout_seconds), 3)
+    except Exception as e:
+        ready = False
+        database["reachable"] = False
+        database["error"] = str(e) or type(e).__name__
+    
+    pool = pool_monitor.stats()
+    if pool_monitor.saturation >= settings.readiness_max_pool_saturation:
+        ready = False
+    
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "timestamp": datetime.utcnow().isoformat() + "Z",
+            "database": database,
+            "pool": pool,
+            "max_pool_saturation": settings.readiness_max_pool_saturation
+        }
+    )
 
 @app.options("/{path:path}")
 async def options_handler(path: str):
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Diff the index manifest against the database and migrate indexes
+Shows the plan by default; pass --apply to build missing and drop obsolete indexes
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import settings
+from app.database.indexes import plan_index_changes, apply_index_changes
+
+
+async def manage_indexes(apply: bool, drop_obsolete: bool) -> None:
+    """Print the index plan and optionally apply it"""
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db = client[settings.database_name]
+    
+    try:
+        print(f"🔍 Comparing index manifest with database '{settings.database_name}'...")
+        plan = await plan_index_changes(db)
+        
+        print(f"\n✅ {len(plan.unchanged)} indexes up to date")
+        
+        if plan.to_create:
+            print(f"\n🔨 Indexes to build ({len(plan.to_create)}):")
+            rebuilt = {(spec.collection, spec.name) for spec in plan.conflicting}
+            for spec in plan.to_create:
+                suffix = " (rebuild: definition changed)" if (spec.collection, spec.name) in rebuilt else ""
+                print(f"  + {spec.collection}.{spec.name}{suffix}")
+        
+        if plan.to_drop:
+            print(f"\n🗑️  Indexes to drop ({len(plan.to_drop)}):")
+            for collection, name in plan.to_drop:
+                print(f"  - {collection}.{name}")
+        
+        if plan.is_empty:
+            print("\n✨ Database indexes match the manifest")
+            return
+        
+        if not apply:
+            print("\nℹ️  Dry run only. Re-run with --apply to make these changes.")
+            return
+        
+        await apply_index_changes(db, plan, drop_obsolete=drop_obsolete)
+        print("\n🎉 Index migration complete")
+        
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate MongoDB indexes to match the manifest")
+    parser.add_argument("--apply", action="store_true", help="Build missing indexes and drop obsolete ones")
+    parser.add_argument("--keep-obsolete", action="store_true", help="Do not drop indexes missing from the manifest")
+    args = parser.parse_args()
+    
+    asyncio.run(manage_indexes(args.apply, not args.keep_obsolete))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Show and apply versioned data migrations
+Lists migration status by default; pass --apply to run pending migrations in throttled,
+resumable batches. An interrupted run picks up from its last checkpoint.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from typing import Optional
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import settings
+from app.database.leases import LeaseManager
+from app.database.migrations import MIGRATIONS, MigrationRunner
+
+
+def print_progress(migration, record) -> None:
+    print(f"  … {migration.name}: {record['processed']} scanned, {record['modified']} modified")
+
+
+async def migrate(apply: bool, batch_size: int, target_ops: float, only: Optional[int] = None) -> None:
+    """Print migration status and optionally apply pending migrations"""
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db = client[settings.database_name]
+    migrations = [m for m in MIGRATIONS if only is None or m.version == only]
+    runner = MigrationRunner(db, batch_size=batch_size, target_ops_per_second=target_ops, migrations=migrations)
+    
+    try:
+        print(f"🔍 Checking migrations on database '{settings.database_name}'...")
+        records = await runner.records()
+        
+        for migration in runner.migrations:
+            record = records.get(migration.version)
+            state = record["state"] if record else "pending"
+            detail = f" ({record['processed']} scanned, {record['modified']} modified)" if record else ""
+            print(f"  {migration.version:>3}  {migration.name:<40} {state}{detail}")
+        
+        pending = await runner.pending()
+        if not pending:
+            print("\n✨ All migrations applied")
+            return
+        
+        if not apply:
+            print(f"\nℹ️  {len(pending)} pending. Re-run with --apply to run them.")
+            return
+        
+        # Only one migrate.py may apply migrations at a time
+        async with LeaseManager(db).hold("migrations") as lease:
+            if lease is None:
+                print("\n⏳ Another migrate.py run is applying migrations. Try again when it finishes.")
+                return
+            
+            for migration in await runner.pending():
+                print(f"\n🔧 Applying {migration.version} {migration.name}...")
+                record = await runner.run(migration, print_progress)
+                print(f"✅ {record['processed']} scanned, {record['modified']} modified")
+        
+        print("\n🎉 Migrations complete")
+        
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply versioned data migrations")
+    parser.add_argument("--apply", action="store_true", help="Run pending migrations")
+    parser.add_argument("--only", type=int, help="Restrict to a single migration version")
+    parser.add_argument("--batch-size", type=int, default=settings.migration_batch_size, help="Documents per batch")
+    parser.add_argument("--target-ops", type=float, default=settings.migration_target_ops_per_second, help="Write rate ceiling in ops/sec (0 for unthrottled)")
+    args = parser.parse_args()
+    
+    asyncio.run(migrate(args.apply, args.batch_size, args.target_ops, args.only))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Change stream cache invalidation checks
+Needs MongoDB running as a replica set; a local single node is enough:
+    mongod --replSet rs0 --dbpath /tmp/rs0 && mongosh --eval "rs.initiate()"
+    MONGODB_URL="mongodb://localhost:27017/?replicaSet=rs0" python test_change_streams.py
+Writes to a scratch database, checks that a subscriber publishes each change, then stops it,
+writes again and checks that a new subscriber resumes from the stored token without gaps.
+"""
+
+import asyncio
+import os
+import sys
+from typing import List
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.database.change_streams import ChangeEvent, ChangeStreamSubscriber
+
+
+def make_subscriber(received: List[ChangeEvent]) -> ChangeStreamSubscriber:
+    subscriber = ChangeStreamSubscriber(
+        name="test-change-streams",
+        collections=["users", "tickets"],
+        max_await_ms=200,
+        token_save_interval_seconds=0,
+        retry_seconds=1
+    )
+    subscriber.subscribe("users", received.append)
+    subscriber.subscribe("tickets", received.append)
+    return subscriber
+
+
+async def wait_for(received: List[ChangeEvent], count: int, timeout: float = 10.0) -> bool:
+    """Wait until at least count events have arrived"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while len(received) < count:
+        if asyncio.get_running_loop().time() > deadline:
+            return False
+        await asyncio.sleep(0.05)
+    return True
+
+
+async def test_change_streams() -> bool:
+    """Publish, stop, write while stopped and resume"""
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db_name = f"{settings.database_name}_change_streams"
+    await client.drop_database(db_name)
+    db = client[db_name]
+    passed = True
+    
+    try:
+        user_id, ticket_id, other_id = ObjectId(), ObjectId(), ObjectId()
+        await db.users.insert_one({"_id": user_id, "role": "agent", "auth_epoch": 0})
+        await db.tickets.insert_one({"_id": ticket_id, "status": "open"})
+        
+        print("🔍 Publishing live changes...")
+        received: List[ChangeEvent] = []
+        subscriber = make_subscriber(received)
+        await subscriber.start(db)  # Returns once the stream is open
+        
+        await db.users.update_one({"_id": user_id}, {"$inc": {"auth_epoch": 1}})
+        await db.tickets.update_one({"_id": ticket_id}, {"$set": {"status": "closed"}})
+        await db.messages.insert_one({"ticket_id": ticket_id})  # Not watched
+        
+        if await wait_for(received, 2) and [(e.collection, e.document_id) for e in received] == [("users", user_id), ("tickets", ticket_id)]:
+            print(f"✅ Received user and ticket changes (auth_epoch={received[0].updated_fields.get('auth_epoch')})")
+        else:
+            print(f"❌ Unexpected events: {received}")
+            passed = False
+        await subscriber.stop()
+        
+        print("🔍 Resuming after a restart...")
+        await db.users.insert_one({"_id": other_id, "role": "customer"})
+        await db.tickets.delete_one({"_id": ticket_id})
+        
+        resumed: List[ChangeEvent] = []
+        subscriber = make_subscriber(resumed)
+        await subscriber.start(db)
+        
+        if await wait_for(resumed, 2) and [(e.operation, e.document_id) for e in resumed] == [("insert", other_id), ("delete", ticket_id)]:
+            print("✅ Changes made while stopped were delivered after resuming")
+        else:
+            print(f"❌ Unexpected resumed events: {resumed}")
+            passed = False
+        
+        if not subscriber.resumed:
+            print("❌ Subscriber did not use the stored resume token")
+            passed = False
+        await subscriber.stop()
+        
+        print("\n🎉 Change streams OK" if passed else "\n💥 Change stream checks failed")
+        return passed
+    
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(test_change_streams()) else 1)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+In-memory database backend checks
+Runs without MongoDB: checks that find_one projections return the same fields
+MongoDB would, so code paths tested on the memory backend behave the same on Mongo.
+    python test_memory_backend.py
+"""
+
+import asyncio
+import os
+import sys
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+
+from app.database.memory import MemoryClient
+
+DOCUMENT = {"email": "a@example.com", "username": "alice", "profile": {"city": "Oslo", "zip": "0150"}}
+
+# Projection -> fields MongoDB returns for DOCUMENT
+PROJECTIONS = [
+    (None, {"_id", "email", "username", "profile"}),
+    ({"_id": 1}, {"_id"}),
+    ({"_id": 0}, {"email", "username", "profile"}),
+    ({"email": 1}, {"_id", "email"}),
+    ({"email": 1, "_id": 0}, {"email"}),
+    ({"email": 1, "username": 1}, {"_id", "email", "username"}),
+    ({"profile": 0}, {"_id", "email", "username"}),
+    ({"profile.city": 1}, {"_id", "profile"}),
+    (["username"], {"_id", "username"}),
+]
+
+
+async def test_projections() -> bool:
+    """Compare the fields each projection returns with MongoDB's"""
+    db = MemoryClient()["test_memory_backend"]
+    document_id = ObjectId()
+    await db.users.insert_one({"_id": document_id, **DOCUMENT})
+    passed = True
+    
+    print("🔍 Checking find_one projections...")
+    for projection, expected in PROJECTIONS:
+        found = await db.users.find_one({"_id": document_id}, projection)
+        if set(found) == expected:
+            print(f"✅ {projection} -> {sorted(found)}")
+        else:
+            print(f"❌ {projection} -> {sorted(found)}, expected {sorted(expected)}")
+            passed = False
+    
+    found = await db.users.find_one({"_id": document_id}, {"profile.city": 1})
+    if found.get("profile") != {"city": "Oslo"}:
+        print(f"❌ Nested projection returned {found.get('profile')}")
+        passed = False
+    
+    print("\n🎉 Memory backend OK" if passed else "\n💥 Memory backend checks failed")
+    return passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(test_projections()) else 1)
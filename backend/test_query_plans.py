@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression checks for the route queries
+Seeds a scratch database on the configured MongoDB, builds the manifest indexes, explains the
+exact filter/sort/pipeline each endpoint builds and fails on collection scans, in-memory sorts
+or a docsExamined/nReturned ratio above the threshold.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+# Add the backend directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from app.config import settings
+from app.database.indexes import plan_index_changes, apply_index_changes
+from app.models.user import AuthPrincipal
+from app.routes.admin import build_user_list_query, build_user_page
+from app.routes.chat import build_message_page_pipeline
+from app.routes.notifications import (
+    build_notification_query, build_notification_page, build_admin_notification_query, build_admin_notification_pipeline
+)
+from app.routes.tickets import build_ticket_list_query, build_ticket_list_pipeline
+
+PAGE_SIZE = 20
+
+
+async def seed(db) -> Dict[str, Any]:
+    """Insert a realistic spread of users, tickets, messages and notifications"""
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    
+    users = []
+    for i in range(300):
+        role = "admin" if i < 5 else "agent" if i < 30 else "customer"
+        users.append({
+            "_id": ObjectId(),
+            "username": f"user{i}",
+            "email": f"user{i}@example.com",
+            "full_name": f"User {i}",
+            "role": role,
+            "status": "active" if i % 10 else "inactive",
+            "created_at": now - timedelta(days=rng.randint(0, 365))
+        })
+    await db.users.insert_many(users)
+    
+    customers = [u["_id"] for u in users if u["role"] == "customer"]
+    agents = [u["_id"] for u in users if u["role"] != "customer"]
+    
+    tickets = []
+    for _ in range(3000):
+        tickets.append({
+            "_id": ObjectId(),
+            "title": "Ticket",
+            "description": "Seeded ticket description",
+            "category": rng.choice(["technical", "billing", "general"]),
+            "priority": rng.choice(["low", "medium", "high", "urgent"]),
+            "status": rng.choice(["open", "in_progress", "pending", "resolved", "closed"]),
+            "created_by": rng.choice(customers),
+            "assigned_to": rng.choice(agents + [None]),
+            "created_at": now - timedelta(minutes=rng.randint(0, 500000)),
+            "updated_at": now,
+            "message_count": 0
+        })
+    await db.tickets.insert_many(tickets)
+    
+    messages = []
+    for _ in range(10000):
+        ticket = rng.choice(tickets)
+        messages.append({
+            "ticket_id": ticket["_id"],
+            "sender_id": rng.choice([ticket["created_by"]] + agents),
+            "content": "Seeded message",
+            "created_at": now - timedelta(minutes=rng.randint(0, 500000))
+        })
+    await db.messages.insert_many(messages)
+    
+    notifications = []
+    for _ in range(10000):
+        notifications.append({
+            "user_id": rng.choice(users)["_id"],
+            "notification_type": rng.choice(["ticket_created", "ticket_assigned", "new_message"]),
+            "priority": rng.choice(["low", "medium", "high"]),
+            "is_read": rng.random() < 0.7,
+            "title": "Seeded notification",
+            "message": "Seeded notification",
+            "created_at": now - timedelta(minutes=rng.randint(0, 500000))
+        })
+    await db.notifications.insert_many(notifications)
+    
+    busiest_ticket_id = Counter(m["ticket_id"] for m in messages).most_common(1)[0][0]
+    return {
+        "customer": AuthPrincipal(id=customers[0], role="customer", status="active"),
+        "agent": AuthPrincipal(id=agents[10], role="agent", status="active"),
+        "ticket_id": busiest_ticket_id,
+        "user_id": users[100]["_id"]
+    }
+
+
+def route_cases(fixtures: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The explainable commands each endpoint issues, built by the routes' own query builders"""
+    customer = fixtures["customer"]
+    agent = fixtures["agent"]
+    
+    def aggregate(collection: str, pipeline: list) -> dict:
+        return {"aggregate": collection, "pipeline": pipeline, "cursor": {}}
+    
+    def count(collection: str, query: dict) -> dict:
+        return {"count": collection, "query": query}
+    
+    def find(collection: str, page: dict) -> dict:
+        # Routes pass find() keyword arguments; the find command takes sort as a document
+        return {"find": collection, **page, "sort": dict(page["sort"])}
+    
+    cases = []
+    
+    # get_tickets
+    for label, principal, status in [
+        ("customer", customer, None),
+        ("agent", agent, None),
+        ("agent, status filter", agent, "open")
+    ]:
+        query = build_ticket_list_query(principal, status=status)
+        cases.append({"name": f"get_tickets ({label}) count", "command": count("tickets", query)})
+        cases.append({"name": f"get_tickets ({label}) page", "command": aggregate("tickets", build_ticket_list_pipeline(query, 0, PAGE_SIZE))})
+    
+    # get_ticket_messages
+    query = {"ticket_id": fixtures["ticket_id"]}
+    cases.append({"name": "get_ticket_messages count", "command": count("messages", query)})
+    cases.append({"name": "get_ticket_messages page", "command": aggregate("messages", build_message_page_pipeline(query, 0, PAGE_SIZE))})
+    
+    # get_notifications
+    for unread_only in (False, True):
+        query = build_notification_query(fixtures["user_id"], unread_only)
+        label = "unread only" if unread_only else "all"
+        cases.append({"name": f"get_notifications ({label}) count", "command": count("notifications", query)})
+        cases.append({"name": f"get_notifications ({label}) page", "command": find("notifications", build_notification_page(query, 0, PAGE_SIZE))})
+    
+    # get_all_notifications_admin
+    for label, kwargs in [
+        ("no filter", {}),
+        ("by user", {"user_id": str(fixtures["user_id"])}),
+        ("by user, unread only", {"user_id": str(fixtures["user_id"]), "unread_only": True})
+    ]:
+        query = build_admin_notification_query(**kwargs)
+        cases.append({"name": f"get_all_notifications_admin ({label}) page", "command": aggregate("notifications", build_admin_notification_pipeline(query, 0, PAGE_SIZE))})
+    
+    # get_all_users
+    for label, kwargs in [("no filter", {}), ("by role", {"role": "agent"})]:
+        query = build_user_list_query(**kwargs)
+        cases.append({"name": f"get_all_users ({label}) page", "command": find("users", build_user_page(query, 0, PAGE_SIZE))})
+    
+    return cases
+
+
+def collect_stages(node: Any, stages: List[str]) -> None:
+    """Collect plan stage names from the winning plan, ignoring rejected and SBE plans"""
+    if isinstance(node, dict):
+        if "stage" in node:
+            stages.append(str(node["stage"]).upper())
+        for key, value in node.items():
+            if key not in ("rejectedPlans", "slotBasedPlan", "allPlansExecution"):
+                collect_stages(value, stages)
+    elif isinstance(node, list):
+        for item in node:
+            collect_stages(item, stages)
+
+
+def find_execution_stats(node: Any) -> Optional[dict]:
+    """Find the first executionStats document in an explain result"""
+    if isinstance(node, dict):
+        if "executionStats" in node:
+            return node["executionStats"]
+        for value in node.values():
+            found = find_execution_stats(value)
+            if found is not None:
+                return found
+    elif isinstance(node, list):
+        for item in node:
+            found = find_execution_stats(item)
+            if found is not None:
+                return found
+    return None
+
+
+def check_plan(case: Dict[str, Any], explain: dict, max_ratio: float) -> List[str]:
+    """Return the problems found in one explain result"""
+    problems = []
+    stages: List[str] = []
+    collect_stages(explain, stages)
+    
+    if "COLLSCAN" in stages:
+        problems.append("collection scan")
+    if "SORT" in stages:
+        problems.append("in-memory sort")
+    
+    stats = find_execution_stats(explain) or {}
+    if "count" not in case["command"] and stats:
+        examined = stats.get("totalDocsExamined", 0)
+        returned = stats.get("nReturned", 0)
+        ratio = examined / max(returned, 1)
+        if ratio > max_ratio:
+            problems.append(f"docsExamined/nReturned {examined}/{returned} = {ratio:.1f} > {max_ratio}")
+    
+    return problems
+
+
+async def test_query_plans(max_ratio: float, keep_data: bool) -> bool:
+    """Seed, explain every route query and report regressions"""
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db_name = f"{settings.database_name}_query_plans"
+    await client.drop_database(db_name)
+    db = client[db_name]
+    
+    try:
+        print(f"🌱 Seeding scratch database '{db_name}'...")
+        fixtures = await seed(db)
+        await apply_index_changes(db, await plan_index_changes(db))
+        
+        failures = 0
+        for case in route_cases(fixtures):
+            explain = await db.command({"explain": case["command"], "verbosity": "executionStats"})
+            problems = check_plan(case, explain, max_ratio)
+            if problems:
+                failures += 1
+                print(f"❌ {case['name']}: {', '.join(problems)}")
+            else:
+                print(f"✅ {case['name']}")
+        
+        if failures:
+            print(f"\n💥 {failures} route queries regressed")
+            return False
+        
+        print("\n🎉 All route queries use indexes")
+        return True
+    
+    finally:
+        if not keep_data:
+            await client.drop_database(db_name)
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assert index usage for every route query")
+    parser.add_argument("--max-ratio", type=float, default=2.0, help="Maximum docsExamined/nReturned ratio")
+    parser.add_argument("--keep-data", action="store_true", help="Keep the seeded scratch database")
+    args = parser.parse_args()
+    
+    passed = asyncio.run(test_query_plans(args.max_ratio, args.keep_data))
+    sys.exit(0 if passed else 1)